@@ -68,6 +68,26 @@
 
 import random
 import math
+import csv
+import json
+import heapq
+import bisect
+import os
+import hashlib
+import shelve
+import collections
+import time
+import warnings
+
+try:
+    import numpy as np
+except ImportError:  # 未安装NumPy时信息素以列表存储，挥发逐个计算
+    np = None
+try:
+    import numba
+except ImportError:  # 未安装Numba时KERNEL引擎以蚂蚁逐个移动的方式(纯Python)求解
+    numba = None
+import multiprocessing
 
 
 class Settings(object):  # 设置类
@@ -75,6 +95,12 @@ class Settings(object):  # 设置类
     ROUTE_LINE_2 = ["d", "i", "j", "k", "l", "m", "f", "n"]  # 2号线站点表
     ROUTE_LINE_4 = ["a", "c", "d", "e", "f", "g", "h"]  # 4号线
     ROUTE_LINE_13 = ["d", "o", "p", "q", "r", "s", "j"]  # 13号线
+    ROUTE_LINES = {
+        "1": ROUTE_LINE_1,
+        "2": ROUTE_LINE_2,
+        "4": ROUTE_LINE_4,
+        "13": ROUTE_LINE_13,
+    }  # 线路名->线路站点表
     STATIONS_ROUTE_TIME = {
         "ac": 13,
         "ca": 13,
@@ -665,31 +691,91 @@ class Settings(object):  # 设置类
     N_CHANGE_ROUTE = {"1->2": 7.5, "2->1": 7.5}  # J
     E_CHANGE_ROUTE = {"1->4": 7.5, "4->1": 6}  # J
     K_CHANGE_ROUTE = {"1->2": 9, "2->1": 7.5}  # J
+    CHANGE_ROUTE = {
+        "d": D_CHANGE_ROUTE,
+        "f": F_CHANGE_ROUTE,
+        "j": J_CHANGE_ROUTE,
+        "n": N_CHANGE_ROUTE,
+        "e": E_CHANGE_ROUTE,
+        "k": K_CHANGE_ROUTE,
+    }  # 换乘站->换乘耗时表("原线路->新线路")，新增换乘站只需在此(或换乘文件中)添加
     MAX_NC = 100  # 最大迭代次数
     ANTS_NUM = 50  # 蚂蚁个数
     PHEROMONE_WEIGHT = 1.0  # 表征信息素重要程度的参数(这里指食物和蚁巢素所占权重)
     MISTAKE_RATE = 1.0 / ANTS_NUM  # 表征启发式因子重要程度的参数
     PERTURBATION = 1.0  # 表征移动时的扰动参数,由于这里的线路限制，扰动为100%出现，可避免大量死蚂蚁
-    MEMORY_ABILITY = 8  # 表征蚂蚁记忆力参数
     RHO = 1.0 / MAX_NC  # 信息素蒸发系数
     PHEROMONE = 100  # 信息素总量参数
+    TRANSITION_RULE = "RULES"  # 转移规则："RULES"觅食/移动/避障规则，"PROBABILITY"按信息素与启发信息的概率转移
+    ALPHA = 1.0  # 概率转移：信息素的重要程度
+    BETA = 2.0  # 概率转移：启发信息(耗时倒数)的重要程度
+    TAU_MIN = 1.0  # 概率转移：信息素下限，尚无信息素时仅按启发信息选择
+    ETA_REMAINING = False  # 概率转移：启发信息是否计入下一站到目标(食物/窝)的剩余最短耗时
+    GROUP_OD = False  # 同一起点的OD对合并为一个蚁群求解(每个终点一层食物信息素，窝信息素共用)
+    # 合并求解只以蚂蚁逐个移动的方式进行：ENGINE的COLONY/KERNEL、PROFILE、WARM_START、PHEROMONE_SNAPSHOT
+    # 及LOWER_BOUND_PRUNING不起作用(设置了前四项时给出警告)
+    GROUP_ANTS = None  # 合并求解时每个终点分配的蚂蚁数，None为ANTS_NUM(与逐个OD对求解相同)
+    RESPAWN = True  # 进入死角的蚂蚁是否回到蚁巢重新出发(否则此后不再移动)
+    DEAD_END_PRUNING = True  # 是否预先排除死胡同(不经过起终点的尽头支线及无法到达起终点的站点)
+    MAX_CHANGES = 3  # 路线最多换乘次数(线路改变的次数)，蚂蚁选择下一站时即遵守，None为不限
+    PROFILE = False  # 是否统计并输出每个OD对各规则的调用次数、耗时及路线未被接受的原因(关闭时无额外开销)
+    LOWER_BOUND_PRUNING = True  # 觅食路线耗时加剩余耗时下界已超出K短路时间窗时，召回蚂蚁重新出发
+    WORKERS = 1  # 并行求解的进程数，大于1时各OD对交由进程池求解
+    SEED = None  # 随机种子，设置后每个OD对以(SEED,OD)为种子，结果可复现
+    WORLD_MAP = "map.txt"  # 方格地图文件(旧格式)，相连站点须在方格中相邻
+    NETWORK_EDGES = None  # 边表文件(CSV/JSON：from,to,minutes,line)，设置后不再使用方格地图
+    NETWORK_LINES = None  # 线路定义文件(CSV/JSON)，与边表配合使用
+    NETWORK_TRANSFERS = None  # 换乘耗时文件(JSON)，为空时使用CHANGE_ROUTE
+    NETWORK_CODES = None  # 站点编码文件(CSV/JSON：label,code)，设置后OD对可使用外部站点编码
+    OD_FILE = None  # OD需求文件(CSV：o,d,demand)，设置后按块流式读取，不再使用O_D
+    OD_CHUNK = 10000  # 每块读取的OD行数
+    FLOW_CHECKPOINT = None  # 断面流量检查点文件(JSON)，每块求解后保存，重新运行时从中断处继续
+    PATH_CACHE = None  # K短路磁盘缓存文件(shelve)，路网或求解参数改变时自动失效
+    PATH_CACHE_SIZE = 10000  # K短路内存缓存(LRU)容量，0为不缓存
+    WARM_START = None  # 信息素初始值：None为0，"HEURISTIC"按到食物/窝最短耗时的倒数，"SNAPSHOT"取信息素快照
+    PHEROMONE_SNAPSHOT = None  # 信息素快照目录，设置后保存每个OD对求解结束时的信息素，供SNAPSHOT热启动
+    ENGINE = "ACO"  # 求解引擎："ACO"蚁群算法，"COLONY"批量蚁群(需NumPy)，"KERNEL"编译蚁群(需Numba)，"YEN"精确K短路
+    K_PATH_WINDOW = 10  # K短路耗时与最短路耗时之差的上限(分钟)
+    MAX_K_PATHS = 0  # K短路表最多保留的路线数，0为不限(仅受K_PATH_WINDOW限制)
+    MIN_NC = 20  # 收敛检测：提前结束前至少迭代的次数
+    STABLE_NC = 30  # 收敛检测：K短路线表连续不变的迭代数达到该值时结束，0为不检测
+    STAGNATION_NC = 15  # 收敛检测：最短路耗时连续不变的迭代数，与信息素熵配合，0为不检测
+    PHEROMONE_ENTROPY = 0.6  # 收敛检测：信息素归一化熵(0集中~1均匀)不高于该值视为信息素已收敛
 
 
 class Ant(object):  # 蚂蚁类
-    def __init__(self, world, square, ant_id):
+    __slots__ = (
+        "world",
+        "square",
+        "behavior",
+        "line",
+        "total_food",
+        "ant_id",
+        "total_route_len",
+        "visited",
+        "route",
+        "is_dead",
+        "scope",
+        "target",
+        "layer",
+        "changes",
+    )
+
+    def __init__(self, world, square, ant_id, target=None, layer=None):
         self.world = world  # 蚂蚁所处的世界
         self.square = square  # 蚂蚁所在方格
         self.behavior = "FOOD"  # 当前蚂蚁行为，初始化为觅食
-        self.prev_direction = -1  # 0-7分别为八个方向
+        self.line = -1  # 当前所在线路编号，-1表示刚出发
         self.total_food = 0  # 所搬的食物数
         self.ant_id = ant_id  # 蚂蚁的编号
-        self.pos_memory = []  # 蚂蚁记忆最近走过的路
         self.total_route_len = 1  # 总路线长度
-        self.food_route = []  # 觅食路线
-        self.nest_route = []  # 寻巢路线
-        self.route = []  # 路线
+        self.visited = bytearray(world.get_dead_end())  # 走过的站点及死胡同(按站点编号)，蚂蚁不再进入
+        self.route = []  # 路线(站点编号)
         self.is_dead = False  # 是否已经进入死角
         self.scope = self.get_scope(square)  # 蚂蚁当前能观察到的范围
+        self.target = world.food_sid if target is None else target  # 所觅食物的站点编号
+        self.layer = layer  # 所用的食物信息素层(合并求解时按终点区分)，None为World的食物信息素
+        self.changes = 0  # 当前路线的换乘次数
 
     # ########以下为扩展############
     def get_square(self):
@@ -711,292 +797,154 @@ class Ant(object):  # 蚂蚁类
         self.ant_id = ant_id
 
     # #####扩展结束###############
-    def get_scope(self, square):  # 获取当前蚂蚁的【范围】
-        x, y = square.x, square.y
-        self.route.append(square.label)  #
-        self.food_route.append(square)  #
-        self.pos_memory.append(square)  #
-        scope = [
-            self.world.SQUARES[y][x - 1],
-            self.world.SQUARES[y + 1][x - 1],
-            self.world.SQUARES[y + 1][x],
-            self.world.SQUARES[y + 1][x + 1],
-            self.world.SQUARES[y][x + 1],
-            self.world.SQUARES[y - 1][x + 1],
-            self.world.SQUARES[y - 1][x],
-            self.world.SQUARES[y - 1][x - 1],
-        ]
-        return scope
+    def get_scope(self, square):  # 获取当前蚂蚁的【范围】，即该站点在邻接表中的相邻站点
+        self.route.append(square.sid)  #
+        self.visited[square.sid] = 1  #
+        return self.world.adjacency[square.sid]
 
     # 蚂蚁所具备的本能【前进->觅食或寻窝】
     def go_next_square(self):
-        next_direction = -1
         square = None
-        route_line = ""
-
-        def change_route_cost():  # 计算换乘代价
-            change_cost = 0
-            # 获得当前换乘情况
-            if self.prev_direction >= 4:
-                tmp = self.prev_direction - 4
-            else:
-                tmp = self.prev_direction + 4
-            prev_station = self.scope[tmp].label
-            cur_station = self.square.label
-            next_station = square.label
-
-            if cur_station == "d":
-                if prev_station in Settings.ROUTE_LINE_4 and next_station in Settings.ROUTE_LINE_13:
-                    change_cost = Settings.D_CHANGE_ROUTE["4->13"]
-                elif (
-                    prev_station in Settings.ROUTE_LINE_4 and next_station in Settings.ROUTE_LINE_2
-                ):
-                    change_cost = Settings.D_CHANGE_ROUTE["4->2"]
-                elif (
-                    prev_station in Settings.ROUTE_LINE_13 and next_station in Settings.ROUTE_LINE_2
-                ):
-                    change_cost = Settings.D_CHANGE_ROUTE["13->2"]
-                elif (
-                    prev_station in Settings.ROUTE_LINE_13 and next_station in Settings.ROUTE_LINE_4
-                ):
-                    change_cost = Settings.D_CHANGE_ROUTE["13->4"]
-                elif (
-                    prev_station in Settings.ROUTE_LINE_2 and next_station in Settings.ROUTE_LINE_4
-                ):
-                    change_cost = Settings.D_CHANGE_ROUTE["2->4"]
-                elif (
-                    prev_station in Settings.ROUTE_LINE_2 and next_station in Settings.ROUTE_LINE_13
-                ):
-                    change_cost = Settings.D_CHANGE_ROUTE["2->13"]
-            elif cur_station == "f":
-                if prev_station in Settings.ROUTE_LINE_4 and next_station in Settings.ROUTE_LINE_2:
-                    change_cost = Settings.F_CHANGE_ROUTE["4->2"]
-                elif (
-                    prev_station in Settings.ROUTE_LINE_2 and next_station in Settings.ROUTE_LINE_4
-                ):
-                    change_cost = Settings.F_CHANGE_ROUTE["2->4"]
-            elif cur_station == "j":
-                if prev_station in Settings.ROUTE_LINE_13 and next_station in Settings.ROUTE_LINE_2:
-                    change_cost = Settings.J_CHANGE_ROUTE["13->2"]
-                elif (
-                    prev_station in Settings.ROUTE_LINE_2 and next_station in Settings.ROUTE_LINE_13
-                ):
-                    change_cost = Settings.J_CHANGE_ROUTE["2->13"]
-            elif cur_station == "n":
-                if prev_station in Settings.ROUTE_LINE_1 and next_station in Settings.ROUTE_LINE_2:
-                    change_cost = Settings.N_CHANGE_ROUTE["1->2"]
-                elif (
-                    prev_station in Settings.ROUTE_LINE_2 and next_station in Settings.ROUTE_LINE_1
-                ):
-                    change_cost = Settings.N_CHANGE_ROUTE["2->1"]
-            elif cur_station == "e":
-                if prev_station in Settings.ROUTE_LINE_1 and next_station in Settings.ROUTE_LINE_4:
-                    change_cost = Settings.E_CHANGE_ROUTE["1->4"]
-                elif (
-                    prev_station in Settings.ROUTE_LINE_4 and next_station in Settings.ROUTE_LINE_1
-                ):
-                    change_cost = Settings.E_CHANGE_ROUTE["4->1"]
-            elif cur_station == "k":
-                if prev_station in Settings.ROUTE_LINE_1 and next_station in Settings.ROUTE_LINE_2:
-                    change_cost = Settings.K_CHANGE_ROUTE["1->2"]
-                elif (
-                    prev_station in Settings.ROUTE_LINE_2 and next_station in Settings.ROUTE_LINE_1
-                ):
-                    change_cost = Settings.K_CHANGE_ROUTE["2->1"]
-
-            return change_cost
+        edge = None
 
         if self.is_dead:  # 如果蚂蚁状态为死亡，则不再移动
             return (None, 10000)
 
-        (next_direction, square, route_line, find_food_nest) = self.find_food_nest_rule()  # 执行觅食规则
+        if Settings.TRANSITION_RULE == "PROBABILITY":  # 执行概率转移规则
+            (square, edge, find_food_nest) = self.transition_rule()
+        else:
+            (square, edge, find_food_nest) = self.find_food_nest_rule()  # 执行觅食规则
         if find_food_nest:  # 找到食物或者窝
+            self.route.append(square.sid)
+            route = route_labels(self.world, self.route)
             if self.behavior == "FOOD":
-                self.food_route.append(square)
-                self.route.append(square.label)
-                route = self.route
-
                 self.behavior = "NEST"
-                self.nest_route = []
-                self.food_route = []
-                self.nest_route.append(square)
             else:
-                self.nest_route.append(square)
-                self.route.append(square.label)
-                route = self.route
-
                 self.behavior = "FOOD"
                 self.total_food += 1
-                self.nest_route = []
-                self.food_route = []
-                self.food_route.append(square)
+            # 清除走过的站点，只需清除路线上的站点
+            for sid in self.route:
+                self.visited[sid] = 0
             # 计算最终路线耗时
-            self.total_route_len += Settings.STATIONS_ROUTE_TIME[route_line]
-            if (
-                self.square.label == "d"
-                or self.square.label == "f"
-                or self.square.label == "j"
-                or self.square.label == "n"
-                or self.square.label == "e"
-                or self.square.label == "k"
-            ) and self.prev_direction != -1:
-                self.total_route_len += change_route_cost()
+            self.total_route_len += edge[1]
+            changes = self.world.transfer[self.square.sid]
+            if changes is not None and self.line != -1:  # 换乘站，查换乘耗时表
+                self.total_route_len += changes.get((self.line, edge[2]), 0)
             total_route_len = self.total_route_len - 1
             # 置位所有参数，进行相反的行为(觅食寻窝转换)
             self.square = square
-            self.prev_direction = -1
+            self.line = -1
+            self.changes = 0
             self.total_route_len = 1
-            self.pos_memory = []
             self.route = []
 
-            self.pos_memory.append(square)  # 蚂蚁记忆最近走过的路
-            self.route.append(square.label)  # 路线
-            x, y = self.square.x, self.square.y
-            self.scope = [
-                self.world.SQUARES[y][x - 1],
-                self.world.SQUARES[y + 1][x - 1],
-                self.world.SQUARES[y + 1][x],
-                self.world.SQUARES[y + 1][x + 1],
-                self.world.SQUARES[y][x + 1],
-                self.world.SQUARES[y - 1][x + 1],
-                self.world.SQUARES[y - 1][x],
-                self.world.SQUARES[y - 1][x - 1],
-            ]
-            self.spread_pheromone_rule(self.square.x, self.square.y)  # 执行播撒信息素规则
+            self.visited[square.sid] = 1  # 蚂蚁记忆走过的路
+            self.route.append(square.sid)  # 路线
+            self.scope = self.world.adjacency[square.sid]
+            self.spread_pheromone_rule(self.square)  # 执行播撒信息素规则
 
             return (route, total_route_len)  # 返回获得的路线
         elif square is None:  # 如果觅食规则无效，则执行移动规则(无效即无信息素指引)
-            (next_direction, square, route_line) = self.move_rule()  # 执行移动规则
+            (square, edge) = self.move_rule()  # 执行移动规则
             if square is None:  # 如果移动规则无效(即撞墙)，则执行避障规则
-                (next_direction, square, route_line) = self.avoid_obstacle_rule()  # 执行避障规则
+                (square, edge) = self.avoid_obstacle_rule()  # 执行避障规则
         if self.is_dead:  # 检查避障规则后蚂蚁是否死亡，是则直接返回
+            if Settings.RESPAWN:  # 回到蚁巢重新出发，下一步继续移动
+                self.respawn()
             return (None, 10000)
         # 计算当前移动后，路径耗时
-        self.total_route_len += Settings.STATIONS_ROUTE_TIME[route_line]
-        if (
-            self.square.label == "d"
-            or self.square.label == "f"
-            or self.square.label == "j"
-            or self.square.label == "n"
-            or self.square.label == "e"
-            or self.square.label == "k"
-        ) and self.prev_direction != -1:
-            self.total_route_len += change_route_cost()
+        self.total_route_len += edge[1]
+        changes = self.world.transfer[self.square.sid]
+        if changes is not None and self.line != -1:  # 换乘站，查换乘耗时表
+            self.total_route_len += changes.get((self.line, edge[2]), 0)
         # 执行移动
+        if self.line != -1 and edge[2] != self.line:  # 线路改变，换乘次数加1
+            self.changes += 1
+        self.line = edge[2]
         self.square = square
-        self.prev_direction = next_direction
-        x, y = self.square.x, self.square.y
-        self.scope = [
-            self.world.SQUARES[y][x - 1],
-            self.world.SQUARES[y + 1][x - 1],
-            self.world.SQUARES[y + 1][x],
-            self.world.SQUARES[y + 1][x + 1],
-            self.world.SQUARES[y][x + 1],
-            self.world.SQUARES[y - 1][x + 1],
-            self.world.SQUARES[y - 1][x],
-            self.world.SQUARES[y - 1][x - 1],
-        ]
-        memory_len = len(self.pos_memory) - 1  # 检查当前已记忆值
-        if memory_len >= Settings.MEMORY_ABILITY:
-            self.pos_memory[Settings.MEMORY_ABILITY - 1] = self.square
-        else:
-            self.pos_memory.append(self.square)
-        # 根据当前行为记录当前路径到对应表
-        if self.behavior == "FOOD":
-            self.food_route.append(self.square)
-        if self.behavior == "NEST":
-            self.nest_route.append(self.square)
-        # 记录该位置到路径表
-        self.route.append(self.square.label)
-        self.spread_pheromone_rule(self.square.x, self.square.y)  # 执行播撒信息素规则
+        self.scope = self.world.adjacency[square.sid]
+        # 记录该位置到走过的站点及路径表
+        self.visited[square.sid] = 1
+        self.route.append(square.sid)
+        self.spread_pheromone_rule(self.square)  # 执行播撒信息素规则
+        if Settings.LOWER_BOUND_PRUNING and self.prune_rule():  # 路线已无望，召回重新出发
+            self.respawn()
         return (None, 10000)
 
+    def respawn(self):  # 回到蚁巢，以新的路线重新觅食
+        self.square = self.world.stations[self.world.nest_sid]
+        self.behavior = "FOOD"
+        self.line = -1
+        self.changes = 0
+        self.total_route_len = 1
+        self.visited = bytearray(self.world.get_dead_end())
+        self.route = []
+        self.is_dead = False
+        self.scope = self.get_scope(self.square)
+
+    def prune_rule(self):
+        """
+        剪枝规则：觅食的蚂蚁当前路线耗时加上到食物的剩余耗时下界已超出K短路耗时上限时，
+        无论之后怎样走，找到的路线都不会进入K短路表，返回True
+        """
+        limit = self.world.route_limits.get(self.target)
+        if limit is None or self.behavior != "FOOD":
+            return False
+        bound = self.world.get_lower_bounds(self.target)[self.square.sid].get(self.line)
+        return bound is None or self.total_route_len - 1 + bound > limit
+
+    def get_food_pheromone(self):  # 本轮读取的食物信息素(所用信息素层的副本)
+        if self.layer is None:
+            return self.world.food_pheromone
+        return self.world.layer_pheromone[self.layer]
+
+    def get_routes(self):
+        """
+        获取所有连通当前站点且未走过的站点，返回(站点，邻接边)表。换乘次数已达MAX_CHANGES时
+        只能沿当前线路前进，超出换乘次数限制的路线不会走出
+        """
+        routes = []
+        stations = self.world.stations
+        visited = self.visited
+        line = self.line
+        at_limit = (
+            Settings.MAX_CHANGES is not None and line != -1 and self.changes >= Settings.MAX_CHANGES
+        )
+        for edge in self.scope:
+            if visited[edge[0]]:
+                continue
+            if at_limit and edge[2] != line:
+                continue
+            routes.append((stations[edge[0]], edge))
+        return routes
+
     def move_rule(self):
         """
         移动规则：每只蚂蚁都朝向外激素最多的方向移，并且，当周围没有外激素指引的时候，蚂蚁会按照自己原来
         运动的方向惯性的运动下去，并且，在运动的方向有一个随机的小的扰动。为了防止蚂蚁原地转圈，
         它会记住最近刚走过了哪些点，如果发现要走的下一点已经在最近走过了，它就会尽量避开。
         """
-        station_routes = Settings.STATIONS_ROUTE_TIME.keys()
-        routes = []
         square = None
-        next_direction = -1
-        line = ""
-
-        def search_route_line():  # 查找上次所在的线路，获得惯性方向
-            next_station = None
-            route_lines = [
-                Settings.ROUTE_LINE_1,
-                Settings.ROUTE_LINE_2,
-                Settings.ROUTE_LINE_4,
-                Settings.ROUTE_LINE_13,
-            ]
-            next_line = None
-
-            if self.prev_direction >= 4:
-                tmp = self.prev_direction - 4
-            else:
-                tmp = self.prev_direction + 4
-            for i in range(4):
-                if self.scope[tmp].label in route_lines[i] and self.square.label in route_lines[i]:
-                    next_line = i  # 哪一条线路
-
-                    index_p = route_lines[i].index(self.scope[tmp].label)
-                    index_c = route_lines[i].index(self.square.label)
-                    if index_p == 0 and index_c == len(route_lines[i]) - 1:
-                        # 0-->last-->
-                        next_station = index_c - 1
-                    elif index_c == 0 and index_p == len(route_lines[i]) - 1:
-                        # last-->0-->
-                        next_station = index_c + 1
-                    elif index_p > index_c:
-                        # <----
-                        if index_c == 0:
-                            next_station = len(route_lines[i]) - 1
-                        else:
-                            next_station = index_c - 1
-                    elif index_p < index_c:
-                        # --->
-                        if index_c == len(route_lines[i]) - 1:
-                            next_station = 0
-                        else:
-                            next_station = index_c + 1
+        edge = None
+
+        routes = self.get_routes()  # 搜索所有连通当前站点且未走过的站点
+        if len(routes) == 0:  # 没有可选线路，直接返回
+            return (None, None)
+        if self.line != -1:  # 查找上次所在的线路，获得惯性方向(沿同一线路的下一站)
+            for route in routes:
+                if route[1][2] == self.line:
+                    (square, edge) = route
                     break
-
-            for i in range(len(routes)):
-                if routes[i].label == route_lines[next_line][next_station]:
-                    return (self.scope.index(routes[i]), routes[i])
-            return (-1, None)
-
-        for i in range(8):  # 搜索所有连通当前站点且未走过的站点
-            if (
-                self.scope[i] is None
-                or self.scope[i] in self.food_route
-                or self.scope[i] in self.nest_route
-            ):
-                continue
-            if self.square.label + self.scope[i].label in station_routes:
-                routes.append(self.scope[i])
-        routes_num = len(routes)
-        if routes_num == 0:  # 没有可选线路，直接返回
-            return (-1, None, "")
-        if self.prev_direction != -1:
-            (next_direction, square) = search_route_line()
         else:
-            square = random.choice(routes)
-            next_direction = self.scope.index(square)
+            (square, edge) = random.choice(routes)
         if random.random() <= Settings.PERTURBATION:  # 扰动规则，符合则进行随机扰动
-            mistake = random.randint(0, 7)
-            square = self.scope[mistake]
-            for i in range(8):
-                if square is not None and square not in routes:
-                    square = None
-            next_direction = mistake
-        if square is None:
-            line = ""
-        else:
-            line = self.square.label + square.label
-        return (next_direction, square, line)
+            mistake = random.choice(self.scope)  # 在所有相邻站点中随机选取一个方向
+            (square, edge) = (None, None)
+            for i in range(len(routes)):
+                if routes[i][1] is mistake:
+                    (square, edge) = routes[i]
+                    break
+        return (square, edge)
 
     def find_food_nest_rule(self):
         """
@@ -1006,123 +954,171 @@ class Ant(object):  # 蚂蚁类
         它对窝的外激素做出反应，而对食物外激素没反应。
         """
 
-        def calculate_pheromone(square, behavior):  # 计算信息素量
-            if behavior == "FOOD":
-                return (
-                    square.pheromone.food_pheromone * Settings.PHEROMONE_WEIGHT
-                    + square.pheromone.nest_pheromone * (1 - Settings.PHEROMONE_WEIGHT)
-                )
-            if behavior == "NEST":
-                return (
-                    square.pheromone.food_pheromone * (1 - Settings.PHEROMONE_WEIGHT)
-                    + square.pheromone.nest_pheromone * Settings.PHEROMONE_WEIGHT
-                )
+        food_pheromone = self.get_food_pheromone()
+        nest_pheromone = self.world.nest_pheromone
+        if self.behavior == "FOOD":  # 计算信息素量时食物、窝信息素的权重
+            (food_weight, nest_weight) = (Settings.PHEROMONE_WEIGHT, 1 - Settings.PHEROMONE_WEIGHT)
+        else:
+            (food_weight, nest_weight) = (1 - Settings.PHEROMONE_WEIGHT, Settings.PHEROMONE_WEIGHT)
 
-        station_routes = Settings.STATIONS_ROUTE_TIME.keys()
-        routes = []
         bool_pheromone = False
         square = None
-        next_direction = -1
-
-        for i in range(8):  # 搜索所有连通当前站点且未走过的站点
-            if (
-                self.scope[i] is None
-                or self.scope[i] in self.food_route
-                or self.scope[i] in self.nest_route
-            ):
-                continue
-            if self.square.label + self.scope[i].label in station_routes:
-                routes.append(self.scope[i])
+        edge = None
 
+        routes = self.get_routes()  # 搜索所有连通当前站点且未走过的站点
         routes_num = len(routes)
         if routes_num == 0:  # 没有可选线路，直接返回
-            return (-1, None, "", False)
+            return (None, None, False)
 
         for i in range(routes_num):
-            if (
-                routes[i].square_food.food_type is not None and self.behavior == "FOOD"
-            ):  # 如果有食物，直接返回，不再考查激素
-                return (i, routes[i], self.square.label + routes[i].label, True)
-            if (
-                routes[i].square_nest.nest_type is not None and self.behavior == "NEST"
-            ):  # 如果有蚁巢，直接返回，不再考查激素
-                return (i, routes[i], self.square.label + routes[i].label, True)  # 方向，方格，线路，是否找到
-            if (routes[i].pheromone.food_pheromone != 0 and self.behavior == "FOOD") or (
-                routes[i].pheromone.nest_pheromone != 0 and self.behavior == "NEST"
+            route_square = routes[i][0]
+            if route_square.sid == self.target and self.behavior == "FOOD":  # 如果有食物，直接返回
+                return (route_square, routes[i][1], True)
+            if route_square.is_nest and self.behavior == "NEST":  # 如果有蚁巢，直接返回，不再考查激素
+                return (route_square, routes[i][1], True)  # 方格，邻接边，是否找到
+            if (food_pheromone[route_square.sid] != 0 and self.behavior == "FOOD") or (
+                nest_pheromone[route_square.sid] != 0 and self.behavior == "NEST"
             ):
                 bool_pheromone = True
 
         if not bool_pheromone:  # 如果没有激素，则返回执行后面的规则
-            return (-1, None, "", False)
+            return (None, None, False)
         else:  # 有激素，则获取所有可选方向
             pheromone_values = []
             pheromone_current_best_value = 0
             pheromone_value = 0
-            line = ""
             for i in range(routes_num):
-                pheromone_value = calculate_pheromone(routes[i], self.behavior)  # 计算方格值
+                sid = routes[i][0].sid  # 计算方格值
+                pheromone_value = (
+                    food_pheromone[sid] * food_weight + nest_pheromone[sid] * nest_weight
+                )
                 pheromone_values.append((pheromone_value, i))
                 if pheromone_value > pheromone_current_best_value:
                     pheromone_current_best_value = pheromone_value
-                    square = routes[i]
-                    next_direction = self.scope.index(square)
+                    (square, edge) = routes[i]
                     next_index = i
-                    line = self.square.label + square.label
 
             if len(pheromone_values) >= 2:  # 少于2个，不具有选错性
                 if random.random() <= Settings.MISTAKE_RATE:  # 执行错误选择信息素方向规则，满足则去除最大值，从剩下的随机选取一个移动
                     values = [v[1] for v in pheromone_values if v[1] != next_index]
-                    next_direction = random.choice(values)
-                    (next_direction, square) = (
-                        self.scope.index(routes[next_direction]),
-                        routes[next_direction],
-                    )
-                    line = self.square.label + square.label
+                    (square, edge) = routes[random.choice(values)]
 
-            return (next_direction, square, line, False)
+            return (square, edge, False)
+
+    def transition_rule(self):
+        """
+        概率转移规则：相邻站点有食物(窝)时直接过去，否则按 (信息素+TAU_MIN)^ALPHA * (1/耗时)^BETA
+        的比例随机选择下一站，耗时为区间耗时加换乘耗时(ETA_REMAINING时再加到目标的剩余最短耗时)，
+        耗时越短越容易被选中，减少绕远的蚂蚁
+        """
+        world = self.world
+        routes = self.get_routes()  # 搜索所有连通当前站点且未走过的站点
+        if len(routes) == 0:  # 没有可选线路，直接返回(由避障规则处理)
+            return (None, None, False)
+        if self.behavior == "FOOD":
+            (weight, target) = (Settings.PHEROMONE_WEIGHT, self.target)
+        else:
+            (weight, target) = (1 - Settings.PHEROMONE_WEIGHT, world.nest_sid)
+        food_pheromone = self.get_food_pheromone()
+        remaining = world.get_distances(target) if Settings.ETA_REMAINING else None
+        changes = world.transfer[self.square.sid]
+        values = []
+        for (square, edge) in routes:
+            if square.sid == target:  # 找到食物或窝
+                return (square, edge, True)
+            tau = (
+                food_pheromone[square.sid] * weight
+                + world.nest_pheromone[square.sid] * (1 - weight)
+                + Settings.TAU_MIN
+            )
+            cost = edge[1]
+            if changes is not None and self.line != -1:
+                cost += changes.get((self.line, edge[2]), 0)
+            if remaining is not None:
+                if remaining[square.sid] is None:  # 无法到达目标
+                    values.append(0.0)
+                    continue
+                cost += remaining[square.sid]
+            values.append(tau**Settings.ALPHA * (1.0 / max(cost, 1e-9)) ** Settings.BETA)
+        total = sum(values)
+        if total <= 0:
+            (square, edge) = random.choice(routes)
+            return (square, edge, False)
+        r = random.random() * total
+        for i in range(len(routes)):
+            r -= values[i]
+            if r < 0:
+                break
+        (square, edge) = routes[i]
+        return (square, edge, False)
 
     def avoid_obstacle_rule(self):
         """
         避障规则：如果蚂蚁要移动的方向有障碍物挡住，它会随机的选择另一个方向，并且有外激素指引的话，
         它会按照觅食的规则行为
         """
-        station_routes = Settings.STATIONS_ROUTE_TIME.keys()
-        routes = []
-
-        for i in range(8):  # 搜索所有连通当前站点且未走过的站点
-            if (
-                self.scope[i] is None
-                or self.scope[i] in self.food_route
-                or self.scope[i] in self.nest_route
-            ):
-                continue
-            if self.square.label + self.scope[i].label in station_routes:
-                routes.append((i, self.scope[i], self.square.label + self.scope[i].label))
-        routes_num = len(routes)
-        if routes_num == 0:  # 没有可选线路，直接返回，设蚂蚁为死亡
+        routes = self.get_routes()  # 搜索所有连通当前站点且未走过的站点
+        if len(routes) == 0:  # 没有可选线路，直接返回，设蚂蚁为死亡
             self.is_dead = True
-            return (-1, None, "")
+            return (None, None)
         else:
             return random.choice(routes)
 
-    def spread_pheromone_rule(self, x, y):
+    def spread_pheromone_rule(self, square):
         """
         播撒外激素规则：每只蚂蚁在刚找到食物或者窝的时候撒发的外激素最多，并随着它走远的距离，
         播撒的外激素越来越少。
         """
         # 释放信息素采用线性规则，即蚂蚁携带的激素总量除以当前路径损耗，可满足释放激素规则
+        # 释放量先记录在世界中，本轮所有蚂蚁移动完毕后统一累加
         if self.behavior == "NEST":
-            self.world.SQUARES[y][x].pheromone.food_pheromone += (
-                1.0 * Settings.PHEROMONE / self.total_route_len
-            )
+            if self.layer is None:
+                deposits = self.world.food_deposits
+            else:
+                deposits = self.world.layer_deposits[self.layer]
+            deposits.append((square.sid, 1.0 * Settings.PHEROMONE / self.total_route_len))
         if self.behavior == "FOOD":
-            self.world.SQUARES[y][x].pheromone.nest_pheromone += (
-                1.0 * Settings.PHEROMONE / self.total_route_len
+            self.world.nest_deposits.append(
+                (square.sid, 1.0 * Settings.PHEROMONE / self.total_route_len)
             )
 
 
+class ProfiledAnt(Ant):  # 剖析蚂蚁类：统计各规则的调用次数、耗时以及进入死角、被剪枝的次数
+    __slots__ = ("profile",)
+
+    def __init__(self, world, square, ant_id, target=None, layer=None, profile=None):
+        Ant.__init__(self, world, square, ant_id, target, layer)
+        self.profile = profile  # 各蚂蚁共用的统计(Profile)
+
+    def find_food_nest_rule(self):
+        return self.profile.call("find_food_nest_rule", Ant.find_food_nest_rule, self)
+
+    def transition_rule(self):
+        return self.profile.call("transition_rule", Ant.transition_rule, self)
+
+    def move_rule(self):
+        return self.profile.call("move_rule", Ant.move_rule, self)
+
+    def avoid_obstacle_rule(self):
+        result = self.profile.call("avoid_obstacle_rule", Ant.avoid_obstacle_rule, self)
+        if self.is_dead:  # 无路可走，进入死角
+            self.profile.dead += 1
+        return result
+
+    def spread_pheromone_rule(self, square):
+        return self.profile.call("spread_pheromone_rule", Ant.spread_pheromone_rule, self, square)
+
+    def prune_rule(self):
+        pruned = self.profile.call("prune_rule", Ant.prune_rule, self)
+        if pruned:
+            self.profile.pruned += 1
+        return pruned
+
+
 # ####扩展类开始#############
 class Food(object):  # 食物类
+    __slots__ = ("food_size", "food_type")
+
     def __init__(self, food_size, food_type):
         self.food_size = food_size
         self.food_type = food_type
@@ -1141,6 +1137,8 @@ class Food(object):  # 食物类
 
 
 class Nest(object):  # 蚁巢类
+    __slots__ = ("nest_type",)
+
     def __init__(self, nest_type):
         self.nest_type = nest_type
 
@@ -1152,6 +1150,8 @@ class Nest(object):  # 蚁巢类
 
 
 class Pheromone(object):  # 激素类
+    __slots__ = ("food_pheromone", "nest_pheromone")
+
     def __init__(self, food_pheromone, nest_pheromone):
         self.food_pheromone = food_pheromone
         self.nest_pheromone = nest_pheromone
@@ -1173,20 +1173,69 @@ class Pheromone(object):  # 激素类
 
 
 class Square(object):  # 范围类
-    def __init__(self, x, y, label):
-        self.square_food = Food(None, None)
-        self.square_nest = Nest(None)
-        self.pheromone = Pheromone(0.0, 0.0)
+    __slots__ = ("is_food", "is_nest", "x", "y", "label", "sid", "code")
+
+    def __init__(self, x, y, label, sid):
+        self.is_food = False  # 是否有食物，食物信息见World.food
+        self.is_nest = False  # 是否为蚁巢，蚁巢信息见World.nest
         self.x = x
         self.y = y
         self.label = label
+        self.sid = sid  # 站点编号，即在World.stations及邻接表中的下标
+        self.code = label  # 外部站点编码，默认与站点名相同
 
 
 class World(object):  # 世界类
-    def __init__(self, world_map):
+    def __init__(self, world_map=None, edges=None, lines=None, transfers=None, codes=None):
+        # 路网可由方格地图(world_map，旧格式)或边表(edges:[(起点，终点，耗时，线路)])加载
+        # transfers为换乘耗时表，格式同Settings.CHANGE_ROUTE，codes为站点名->外部站点编码
         self.food_pos = []
         self.nest_pos = []
-        self.SQUARES = self.get_world_map_squares(world_map)
+        self.food = None  # 食物(位于food_pos)
+        self.nest = None  # 蚁巢(位于nest_pos)
+        self.food_sid = None  # 食物所在站点编号
+        self.food_sids = []  # 合并求解时全部食物(终点)所在站点编号，food_sid为其中第一个
+        self.nest_sid = None  # 蚁巢所在站点编号
+        self.stations = []  # 站点表，下标即站点编号
+        self.station_index = {}  # 站点名->站点编号
+        self.station_codes = {}  # 外部站点编码->站点编号
+        # 线路名->线路站点表
+        self.route_lines = dict(Settings.ROUTE_LINES if lines is None else lines)
+        self.lines = list(self.route_lines.keys())  # 线路表，下标即线路编号
+        if edges is None:
+            self.SQUARES = self.get_world_map_squares(world_map)
+            # 邻接表：站点编号->[(相邻站点编号，耗时，线路编号)]
+            self.adjacency = self.get_adjacency()
+        else:
+            self.SQUARES = None  # 边表路网没有方格地图
+            self.adjacency = self.get_edge_list_adjacency(edges)
+        self.set_station_codes({} if codes is None else codes)
+        # 有向边表，下标即边编号(断面流量数组下标)
+        self.edges = [
+            (sid, nbr[0]) for sid in range(len(self.adjacency)) for nbr in self.adjacency[sid]
+        ]
+        self.edge_index = dict((edge, eid) for (eid, edge) in enumerate(self.edges))
+        self.transfer = self.get_transfer(Settings.CHANGE_ROUTE if transfers is None else transfers)
+        self.fingerprint = None  # 路网指纹(首次使用时计算)
+        self.adjacency_arrays = None  # 批量蚁群使用的邻接表数组(首次使用时生成)
+        self.transfer_arrays = None  # 批量蚁群使用的换乘耗时数组(首次使用时生成)
+        self.distances = {}  # 目标站点编号->各站点到目标的最短耗时，换OD对时清空
+        self.lower_bounds = {}  # 目标站点编号->各站点(按所在线路)到目标的剩余耗时下界，换OD对时清空
+        self.route_limits = {}  # 目标站点编号->K短路耗时上限(最短路耗时+K_PATH_WINDOW)，供剪枝使用
+        self.dead_end = bytearray(len(self.stations))  # 当前OD对的死胡同站点(为1)，蚂蚁不会进入
+        self.peeling = None  # 拓扑剪枝结果(首次使用时计算)
+        self.reachable = {}  # 目标站点编号->能到达目标的站点标记，路网不变，各OD对共用
+        # 信息素以站点编号为下标存于两个连续数组中，挥发为一次整体乘法
+        self.pheromone = Pheromone(new_array(len(self.stations)), new_array(len(self.stations)))
+        self.food_deposits = []  # 本轮蚂蚁释放的食物信息素(站点编号，释放量)
+        self.nest_deposits = []  # 本轮蚂蚁释放的窝信息素
+        self.food_pheromone = None  # 本轮蚂蚁读取的信息素(列表副本，本轮内不变)
+        self.nest_pheromone = None
+        # 合并求解时各终点的食物信息素层(窝信息素各终点共用)，以及对应的释放量与读取副本
+        self.layers = []
+        self.layer_deposits = []
+        self.layer_pheromone = []
+        self.refresh_pheromone()
 
     def get_world_map_squares(self, world_map):  # 初始化世界地图
         width = len(world_map[0])
@@ -1197,146 +1246,1933 @@ class World(object):  # 世界类
                 if world_map[y][x] == "1":
                     continue
                 else:
-                    SQUARES[y][x] = Square(x, y, world_map[y][x])
+                    SQUARES[y][x] = Square(x, y, world_map[y][x], len(self.stations))
+                    self.station_index[world_map[y][x]] = len(self.stations)
+                    self.stations.append(SQUARES[y][x])
         return SQUARES
 
+    def get_adjacency(self):  # 由地图生成邻接表，仅在加载地图时执行一次，蚂蚁移动时不再扫描方格
+        adjacency = []
+        for square in self.stations:
+            x, y = square.x, square.y
+            scope = [
+                self.SQUARES[y][x - 1],
+                self.SQUARES[y + 1][x - 1],
+                self.SQUARES[y + 1][x],
+                self.SQUARES[y + 1][x + 1],
+                self.SQUARES[y][x + 1],
+                self.SQUARES[y - 1][x + 1],
+                self.SQUARES[y - 1][x],
+                self.SQUARES[y - 1][x - 1],
+            ]
+            edges = []
+            for next_square in scope:
+                if next_square is None:
+                    continue
+                route_line = square.label + next_square.label
+                if route_line in Settings.STATIONS_ROUTE_TIME:
+                    edges.append(
+                        (
+                            next_square.sid,
+                            Settings.STATIONS_ROUTE_TIME[route_line],
+                            self.get_edge_line(square.label, next_square.label),
+                        )
+                    )
+            adjacency.append(edges)
+        return adjacency
+
+    def get_edge_list_adjacency(self, edges):  # 由边表生成站点及邻接表，站点度数不受方格地图限制
+        route_times = {}
+        for (label, next_label, minutes, line) in edges:
+            for l in (label, next_label):
+                if l not in self.station_index:
+                    self.station_index[l] = len(self.stations)
+                    self.stations.append(Square(None, None, l, len(self.stations)))
+            if line and line not in self.route_lines:
+                self.route_lines[line] = []
+                self.lines.append(line)
+            # 边默认双向，若边表中单独给出反向边则以其为准
+            route_times[(label, next_label)] = (minutes, line)
+            route_times.setdefault((next_label, label), (minutes, line))
+        adjacency = [[] for i in range(len(self.stations))]
+        for (label, next_label), (minutes, line) in route_times.items():
+            if line:
+                line_id = self.lines.index(line)
+            else:
+                line_id = self.get_edge_line(label, next_label)
+            adjacency[self.station_index[label]].append(
+                (self.station_index[next_label], minutes, line_id)
+            )
+        return adjacency
+
+    def get_edge_line(self, label, next_label):  # 查找两相邻站点所属线路编号，环线首尾亦视为相邻
+        for i in range(len(self.lines)):
+            line_stations = self.route_lines[self.lines[i]]
+            if label in line_stations and next_label in line_stations:
+                index_c = line_stations.index(label)
+                index_n = line_stations.index(next_label)
+                if abs(index_c - index_n) in (1, len(line_stations) - 1):
+                    return i
+        return -1
+
+    def set_station_codes(self, codes):  # 建立外部站点编码索引，未给出编码的站点以站点名为编码
+        for (label, code) in codes.items():
+            if label in self.station_index:
+                self.stations[self.station_index[label]].code = code
+        self.station_codes = dict((square.code, square.sid) for square in self.stations)
+
+    def get_sid(self, key):  # 按站点名或外部站点编码查找站点编号
+        if key in self.station_index:
+            return self.station_index[key]
+        if key in self.station_codes:
+            return self.station_codes[key]
+        raise KeyError("unknown station: %s" % (key,))
+
+    def has_station(self, key):  # 是否有该站点名或外部站点编码
+        return key in self.station_index or key in self.station_codes
+
+    def get_station(self, key):  # 按站点名或外部站点编码查找站点
+        return self.stations[self.get_sid(key)]
+
     def set_nest(self, label, *position):  # 设置窝点
         # (x,y)=position
         # self.SQUARES[x][y].square_nest.nest_type='NEST'
         #
-        for y in range(len(self.SQUARES)):
-            for x in range(len(self.SQUARES[0])):
-                if self.SQUARES[y][x] is None:
-                    continue
-                if self.SQUARES[y][x].label == label:
-                    self.SQUARES[y][x].square_nest.nest_type = "NEST"
-                    self.nest_pos = [x, y]
-                    return (x, y)
+        square = self.get_station(label)
+        square.is_nest = True
+        self.nest_sid = square.sid
+        self.nest = Nest("NEST")
+        self.nest_pos = [square.x, square.y]
+        return (square.x, square.y)
 
     def set_food(self, label, *position):  # 设置食物点
         # (x,y)=position
         # self.SQUARES[x][y].square_food.food_type='FOOD'
         # self.SQUARES[x][y].square_food.food_size='BIG'
-        for y in range(len(self.SQUARES)):
-            for x in range(len(self.SQUARES[0])):
-                if self.SQUARES[y][x] is None:
+        square = self.get_station(label)
+        square.is_food = True
+        self.food_sid = square.sid
+        self.food = Food("BIG", "FOOD")
+        self.food_pos = [square.x, square.y]
+        return (square.x, square.y)
+
+    def reset(self, nest_label, food_label, *food_labels):
+        """
+        复用已加载的路网求解新的OD对：清空信息素，将窝点与食物点移到新的站点(按站点名直接定位)，
+        不再重新解析地图、创建站点。给出多个食物点(同一起点的多个终点)时为每个终点建立一层食物信息素
+        """
+        if self.nest_sid is not None:
+            self.stations[self.nest_sid].is_nest = False
+        for sid in self.food_sids:
+            self.stations[sid].is_food = False
+        pheromone = self.pheromone
+        if np is not None:
+            pheromone.food_pheromone.fill(0.0)
+            pheromone.nest_pheromone.fill(0.0)
+        else:
+            pheromone.food_pheromone = new_array(len(self.stations))
+            pheromone.nest_pheromone = new_array(len(self.stations))
+        self.food_deposits = []
+        self.nest_deposits = []
+        self.refresh_pheromone()
+        self.distances = {}
+        self.lower_bounds = {}
+        self.route_limits = {}
+        self.set_nest(nest_label)
+        self.food_sids = [self.get_sid(label) for label in (food_label,) + food_labels]
+        for label in food_labels:
+            self.set_food(label)
+        self.set_food(food_label)
+        if food_labels:
+            self.layers = [new_array(len(self.stations)) for sid in self.food_sids]
+            self.layer_deposits = [[] for sid in self.food_sids]
+        else:
+            self.layers = []
+            self.layer_deposits = []
+        self.refresh_pheromone()
+        self.dead_end = None  # 死胡同标记在首次使用时计算(get_dead_end)，重置本身不扫描路网
+
+    def get_dead_end(self):  # 当前OD对的死胡同标记(按站点编号，为1时蚂蚁不会进入)，首次使用时计算
+        if self.dead_end is None:
+            if Settings.DEAD_END_PRUNING:
+                self.dead_end = self.get_dead_ends()
+            else:
+                self.dead_end = bytearray(len(self.stations))
+        return self.dead_end
+
+    def get_dead_ends(self):
+        """
+        死胡同站点：反复剪去只有一个相邻站点的站点(起终点除外)，剩下的尽头支线进入后只能原路返回，
+        而蚂蚁不走回头路，必然进入死角；以及无法到达窝或任一食物的站点。返回按站点编号的标记数组。
+        剪枝及可达站点只与路网有关，首次计算后各OD对共用，这里只把起终点所在的支线恢复为可走，
+        并合并起终点的可达标记
+        """
+        keep = [self.nest_sid] + self.food_sids
+        (peeled, parent) = self.get_peeling()
+        dead_end = bytearray(peeled)
+        for sid in keep:  # 起终点及其通往主干的支线不是死胡同
+            while sid != -1 and dead_end[sid]:
+                dead_end[sid] = 0
+                sid = parent[sid]
+        # 每个站点占一个字节(0或1)，按整数做位运算即逐站点合并
+        reach_food = 0
+        for sid in self.food_sids:
+            reach_food |= int.from_bytes(self.get_reachable(sid), "little")
+        alive = int.from_bytes(self.get_reachable(self.nest_sid), "little") & reach_food
+        ones = int.from_bytes(b"\x01" * len(self.stations), "little")
+        dead = int.from_bytes(dead_end, "little") | (ones ^ alive)
+        dead_end = bytearray(dead.to_bytes(len(self.stations), "little"))
+        for sid in keep:
+            dead_end[sid] = 0
+        return dead_end
+
+    def get_peeling(self):
+        """
+        反复剪去只有一个相邻站点的站点，返回(是否被剪去，剪去时连接的相邻站点)，后者为-1表示没有。
+        只与路网有关，首次使用时计算
+        """
+        if self.peeling is None:
+            neighbours = [set() for i in range(len(self.stations))]  # 相邻站点(不分方向)
+            for sid in range(len(self.adjacency)):
+                for edge in self.adjacency[sid]:
+                    neighbours[sid].add(edge[0])
+                    neighbours[edge[0]].add(sid)
+            peeled = bytearray(len(self.stations))
+            parent = [-1] * len(self.stations)
+            degree = [len(n) for n in neighbours]
+            leaves = [sid for sid in range(len(self.stations)) if degree[sid] <= 1]
+            while leaves:
+                sid = leaves.pop()
+                if peeled[sid]:
                     continue
-                if self.SQUARES[y][x].label == label:
-                    self.SQUARES[y][x].square_food.food_type = "FOOD"
-                    self.SQUARES[y][x].square_food.food_size = "BIG"
-                    self.food_pos = [x, y]
-                    return (x, y)
+                peeled[sid] = 1
+                for nbr in neighbours[sid]:
+                    if peeled[nbr]:
+                        continue
+                    parent[sid] = nbr
+                    degree[nbr] -= 1
+                    if degree[nbr] <= 1:
+                        leaves.append(nbr)
+            self.peeling = (peeled, parent)
+        return self.peeling
+
+    def get_reachable(self, target):  # 能到达target的站点(按站点编号，为1)，各OD对共用
+        if target not in self.reachable:
+            reverse = [[] for i in range(len(self.stations))]  # 反向邻接表
+            for sid in range(len(self.adjacency)):
+                for edge in self.adjacency[sid]:
+                    reverse[edge[0]].append(sid)
+            reachable = bytearray(len(self.stations))
+            reachable[target] = 1
+            stack = [target]
+            while stack:
+                for prev in reverse[stack.pop()]:
+                    if not reachable[prev]:
+                        reachable[prev] = 1
+                        stack.append(prev)
+            self.reachable[target] = reachable
+        return self.reachable[target]
+
+    def get_distances(self, target):  # 各站点到target的最短耗时(不含换乘耗时)，不可达为None
+        if target not in self.distances:
+            self.distances[target] = distances_to(self, target)
+        return self.distances[target]
+
+    def get_lower_bounds(self, target):  # 各站点按所在线路到target的剩余耗时下界(含换乘耗时)
+        if target not in self.lower_bounds:
+            self.lower_bounds[target] = lower_bounds_to(self, target)
+        return self.lower_bounds[target]
+
+    def set_pheromone(self, food_pheromone, nest_pheromone):  # 以给定的各站点信息素值替换当前信息素
+        pheromone = self.pheromone
+        if np is not None:
+            pheromone.food_pheromone[:] = food_pheromone
+            pheromone.nest_pheromone[:] = nest_pheromone
+        else:
+            pheromone.food_pheromone = list(food_pheromone)
+            pheromone.nest_pheromone = list(nest_pheromone)
+        self.refresh_pheromone()
+
+    def network_hash(self):  # 路网指纹：站点、邻接表(耗时，线路)及换乘耗时表的哈希值
+        if self.fingerprint is None:
+            transfer = [
+                None if changes is None else sorted([k[0], k[1], v] for (k, v) in changes.items())
+                for changes in self.transfer
+            ]
+            network = [[s.label for s in self.stations], self.adjacency, self.lines, transfer]
+            self.fingerprint = hashlib.sha1(json.dumps(network).encode("utf8")).hexdigest()
+        return self.fingerprint
+
+    def get_transfer(self, transfers):
+        """
+        编译换乘耗时表：换乘站编号->{(原线路编号，新线路编号):耗时}，非换乘站为None。
+        换乘按实际乘坐线路判断(到达边与离开边所属线路)，每次移动只需一次查表
+        """
+        transfer = [None for i in range(len(self.stations))]
+        for label in transfers:
+            if label not in self.station_index:
+                continue
+            changes = {}
+            for key in transfers[label]:
+                (line, next_line) = key.split("->")
+                if line in self.lines and next_line in self.lines:
+                    changes[(self.lines.index(line), self.lines.index(next_line))] = transfers[
+                        label
+                    ][key]
+            transfer[self.station_index[label]] = changes
+        return transfer
+
+    def get_edge(self, sid, next_sid):  # 查找相邻两站点间的邻接边
+        for edge in self.adjacency[sid]:
+            if edge[0] == next_sid:
+                return edge
+        return None
+
+    def get_route_time(self, sid, next_sid):  # 查找相邻两站点间耗时
+        return self.get_edge(sid, next_sid)[1]
+
+    def change_route_cost(self, prev_sid, cur_sid, next_sid):  # 计算换乘代价
+        changes = self.transfer[cur_sid]
+        if changes is None:
+            return 0
+        line = self.get_edge(prev_sid, cur_sid)[2]
+        next_line = self.get_edge(cur_sid, next_sid)[2]
+        return changes.get((line, next_line), 0)
+
+    def get_adjacency_arrays(self):
+        """
+        邻接表转为定长数组(站点数*最大度数)：相邻站点编号(不足处为-1)，耗时，线路编号，供批量蚁群使用。
+        路网不变，首次生成后各OD对共用
+        """
+        if self.adjacency_arrays is not None:
+            return self.adjacency_arrays
+        degree = max([len(edges) for edges in self.adjacency] + [1])
+        nbr = np.full((len(self.stations), degree), -1, dtype=np.int64)
+        nbr_time = np.zeros((len(self.stations), degree))
+        nbr_line = np.full((len(self.stations), degree), -1, dtype=np.int64)
+        for sid in range(len(self.stations)):
+            for i in range(len(self.adjacency[sid])):
+                (nbr[sid, i], nbr_time[sid, i], nbr_line[sid, i]) = self.adjacency[sid][i]
+        self.adjacency_arrays = (nbr, nbr_time, nbr_line)
+        return self.adjacency_arrays
+
+    def get_transfer_matrix(self):
+        """
+        换乘耗时表转为数组：站点编号->换乘站序号(非换乘站为-1)，以及换乘站序号*原线路*新线路的耗时数组
+        """
+        if self.transfer_arrays is not None:
+            return self.transfer_arrays
+        interchange = np.full(len(self.stations), -1, dtype=np.int64)
+        sids = [sid for sid in range(len(self.stations)) if self.transfer[sid] is not None]
+        matrix = np.zeros((len(sids), len(self.lines), len(self.lines)))
+        for i in range(len(sids)):
+            interchange[sids[i]] = i
+            for (line, next_line), cost in self.transfer[sids[i]].items():
+                matrix[i, line, next_line] = cost
+        self.transfer_arrays = (interchange, matrix)
+        return self.transfer_arrays
 
     def update_pheromone(self):  # 更新信息素规则(环境挥发)
+        # 累加本轮蚂蚁释放的信息素
+        pheromone = self.pheromone
+        pheromone.food_pheromone = add_at(pheromone.food_pheromone, self.food_deposits)
+        pheromone.nest_pheromone = add_at(pheromone.nest_pheromone, self.nest_deposits)
+        self.food_deposits = []
+        self.nest_deposits = []
+        for i in range(len(self.layers)):
+            self.layers[i] = add_at(self.layers[i], self.layer_deposits[i])
+            self.layer_deposits[i] = []
         # 更新信息素,挥发
-        for y in range(len(self.SQUARES)):
-            for x in range(len(self.SQUARES[0])):
-                if self.SQUARES[y][x] is not None:
-                    self.SQUARES[y][x].pheromone.food_pheromone = (1 - Settings.RHO) * self.SQUARES[
-                        y
-                    ][x].pheromone.food_pheromone
-                    self.SQUARES[y][x].pheromone.nest_pheromone = (1 - Settings.RHO) * self.SQUARES[
-                        y
-                    ][x].pheromone.nest_pheromone
-
-
-def Init_ACO_K_ShortRoute():  # 算法函数
-    # 加载地图
+        if np is not None:
+            pheromone.food_pheromone *= 1 - Settings.RHO
+            pheromone.nest_pheromone *= 1 - Settings.RHO
+            for layer in self.layers:
+                layer *= 1 - Settings.RHO
+        else:
+            pheromone.food_pheromone = [(1 - Settings.RHO) * v for v in pheromone.food_pheromone]
+            pheromone.nest_pheromone = [(1 - Settings.RHO) * v for v in pheromone.nest_pheromone]
+            self.layers = [[(1 - Settings.RHO) * v for v in layer] for layer in self.layers]
+        self.refresh_pheromone()
+
+    def refresh_pheromone(self):  # 生成蚂蚁读取用的信息素副本，逐个读取时列表比数组快
+        if np is not None:
+            self.food_pheromone = self.pheromone.food_pheromone.tolist()
+            self.nest_pheromone = self.pheromone.nest_pheromone.tolist()
+            self.layer_pheromone = [layer.tolist() for layer in self.layers]
+        else:
+            self.food_pheromone = self.pheromone.food_pheromone
+            self.nest_pheromone = self.pheromone.nest_pheromone
+            self.layer_pheromone = self.layers
+
+
+def new_array(size):  # 创建按编号存储的数组(站点信息素，边断面流量)，初始值为0
+    if np is not None:
+        return np.zeros(size)
+    return [0.0] * size
+
+
+def add_at(array, deposits):  # 将(编号，增量)表按顺序批量累加到数组
+    if len(deposits) == 0:
+        return array
+    if np is not None:
+        (ids, values) = zip(*deposits)
+        np.add.at(array, list(ids), list(values))
+        return array
+    array = list(array)
+    for (i, value) in deposits:
+        array[i] += value
+    return array
+
+
+class Colony(object):  # 蚁群类：以数组表示全部蚂蚁，每次整体前进一步
+    """
+    批量蚁群：所有蚂蚁的位置、行为、所在线路、路线耗时、走过的站点均以数组存储，每步对全部蚂蚁
+    同时执行觅食寻巢、移动、避障及播撒信息素规则。有信息素指引时按信息素轮盘赌选择下一站，
+    否则按惯性(同一线路)前进并随机扰动；TRANSITION_RULE为"PROBABILITY"时全部按概率转移规则选择。
+    需要NumPy
+    """
+
+    def __init__(self, world, nest_sid, food_sid, ants_num):
+        if np is None:
+            raise ImportError("Colony engine requires numpy")
+        self.world = world
+        self.nest_sid = nest_sid
+        self.food_sid = food_sid
+        self.ants_num = ants_num
+        self.rng = np.random.default_rng(random.getrandbits(64))  # 由random派生，SEED同样有效
+        (self.nbr, self.nbr_time, self.nbr_line) = world.get_adjacency_arrays()
+        (self.interchange, self.transfer_matrix) = world.get_transfer_matrix()
+        stations_num = len(world.stations)
+        self.pos = np.full(ants_num, nest_sid, dtype=np.int64)  # 所在站点
+        self.behavior = np.zeros(ants_num, dtype=np.int8)  # 0为觅食，1为寻巢
+        self.line = np.full(ants_num, -1, dtype=np.int64)  # 所在线路，-1表示刚出发
+        self.changes = np.zeros(ants_num, dtype=np.int64)  # 当前路线的换乘次数
+        self.total_route_len = np.ones(ants_num)  # 总路线长度
+        self.total_food = np.zeros(ants_num, dtype=np.int64)  # 所搬的食物数
+        self.is_dead = np.zeros(ants_num, dtype=bool)  # 是否已经进入死角
+        self.dead_end = np.frombuffer(bytes(world.get_dead_end()), dtype=np.uint8).astype(bool)
+        self.visited = np.zeros((ants_num, stations_num), dtype=bool)  # 走过的站点及死胡同
+        self.visited[:] = self.dead_end
+        self.visited[:, nest_sid] = True
+        self.routes = np.zeros((ants_num, stations_num + 1), dtype=np.int64)  # 路线(站点编号)
+        self.routes[:, 0] = nest_sid
+        self.route_count = np.ones(ants_num, dtype=np.int64)  # 路线站点数
+        self.lower_bound = None  # 剪枝：各站点按所在线路(列号为线路编号+1)到食物的剩余耗时下界
+        if Settings.LOWER_BOUND_PRUNING:
+            self.lower_bound = np.full((stations_num, len(world.lines) + 1), np.inf)
+            for (sid, bounds) in enumerate(world.get_lower_bounds(food_sid)):
+                for (line, bound) in bounds.items():
+                    self.lower_bound[sid, line + 1] = bound
+        self.remaining = None  # 概率转移：各站点到食物、窝的剩余最短耗时(不可达为inf)
+        if Settings.ETA_REMAINING:
+            self.remaining = np.array(
+                [
+                    [np.inf if d is None else d for d in world.get_distances(target)]
+                    for target in (food_sid, nest_sid)
+                ]
+            )
+
+    def respawn(self, ants):  # 蚂蚁回到蚁巢，以新的路线重新觅食
+        self.pos[ants] = self.nest_sid
+        self.behavior[ants] = 0
+        self.line[ants] = -1
+        self.changes[ants] = 0
+        self.total_route_len[ants] = 1
+        self.visited[ants] = self.dead_end
+        self.visited[ants, self.nest_sid] = True
+        self.routes[ants, 0] = self.nest_sid
+        self.route_count[ants] = 1
+
+    def transition_weights(self, cur, line, behavior, safe_cand, valid, tau):
+        """
+        概率转移规则的选择权重：(信息素+TAU_MIN)^ALPHA * (1/耗时)^BETA，耗时为区间耗时加换乘耗时
+        (ETA_REMAINING时再加到目标的剩余最短耗时)，所有相邻站点都不可达目标时各方向等权
+        """
+        cost = self.nbr_time[cur].astype(float)
+        inter = self.interchange[cur]
+        changing = valid & ((inter >= 0) & (line >= 0))[:, None]
+        if changing.any():
+            (rows, cols) = np.nonzero(changing)
+            cost[rows, cols] += self.transfer_matrix[
+                inter[rows], line[rows], self.nbr_line[cur[rows], cols]
+            ]
+        if self.remaining is not None:
+            cost = cost + self.remaining[behavior[:, None], safe_cand]
+        weights = (tau + Settings.TAU_MIN) ** Settings.ALPHA * (
+            1.0 / np.maximum(cost, 1e-9)
+        ) ** Settings.BETA
+        weights = np.where(valid, weights, 0.0)
+        unreachable = weights.sum(axis=1) <= 0
+        weights[unreachable] = valid[unreachable]
+        return weights
+
+    def go_next_square(self):  # 全部蚂蚁前进一步，返回本步找到食物或窝的[(路线，耗时)]
+        alive = ~self.is_dead
+        cand = self.nbr[self.pos]  # 各蚂蚁的相邻站点，不足最大度数处为-1
+        valid = (cand >= 0) & alive[:, None]
+        valid[valid] = ~self.visited[np.nonzero(valid)[0], cand[valid]]
+        if Settings.MAX_CHANGES is not None:  # 换乘次数已达上限的蚂蚁只能沿当前线路前进
+            at_limit = (self.line >= 0) & (self.changes >= Settings.MAX_CHANGES)
+            valid &= ~(at_limit[:, None] & (self.nbr_line[self.pos] != self.line[:, None]))
+        routes_num = valid.sum(axis=1)
+        # 无可选线路的蚂蚁进入死角，RESPAWN时回到蚁巢重新出发(本步不移动)
+        stuck = alive & (routes_num == 0)
+        if Settings.RESPAWN:
+            self.respawn(np.nonzero(stuck)[0])
+        else:
+            self.is_dead |= stuck
+        moving = np.nonzero(alive & ~stuck)[0]
+        if len(moving) == 0:
+            return []
+        cand = cand[moving]
+        valid = valid[moving]
+        behavior = self.behavior[moving]
+        safe_cand = np.where(valid, cand, 0)
+        # 觅食寻巢规则：相邻站点有目标则直接过去
+        target = np.where(behavior == 0, self.food_sid, self.nest_sid)
+        hit = valid & (cand == target[:, None])
+        find_food_nest = hit.any(axis=1)
+        # 有信息素指引则按信息素轮盘赌选择
+        pheromone = self.world.pheromone
+        weight = np.where(behavior == 0, Settings.PHEROMONE_WEIGHT, 1 - Settings.PHEROMONE_WEIGHT)
+        tau = (
+            pheromone.food_pheromone[safe_cand] * weight[:, None]
+            + pheromone.nest_pheromone[safe_cand] * (1 - weight[:, None])
+        )
+        tau = np.where(valid, tau, 0.0)
+        guided = (tau > 0).any(axis=1)
+        if Settings.TRANSITION_RULE == "PROBABILITY":  # 概率转移规则：全部按权重轮盘赌
+            guided[:] = True
+            tau = self.transition_weights(
+                self.pos[moving], self.line[moving], behavior, safe_cand, valid, tau
+            )
+        cum = np.cumsum(tau, axis=1)
+        r = self.rng.random(len(moving)) * cum[:, -1]
+        pheromone_choice = np.argmax(cum > r[:, None], axis=1)
+        # 移动规则：按惯性沿同一线路前进，并以PERTURBATION概率随机扰动；避障规则：随机选择可走方向
+        keys = np.where(valid, self.rng.random(valid.shape), -1.0)
+        random_choice = np.argmax(keys, axis=1)
+        inertia = valid & (self.nbr_line[self.pos[moving]] == self.line[moving][:, None])
+        inertia_choice = np.argmax(inertia, axis=1)
+        use_inertia = inertia.any(axis=1) & (self.rng.random(len(moving)) > Settings.PERTURBATION)
+        move_choice = np.where(use_inertia, inertia_choice, random_choice)
+        choice = np.where(
+            find_food_nest, np.argmax(hit, axis=1), np.where(guided, pheromone_choice, move_choice)
+        )
+        # 计算当前移动后，路径耗时(含换乘耗时)
+        cur = self.pos[moving]
+        next_sid = cand[np.arange(len(moving)), choice]
+        next_line = self.nbr_line[cur, choice]
+        cost = self.nbr_time[cur, choice].astype(float)
+        line = self.line[moving]
+        inter = self.interchange[cur]
+        changing = (inter >= 0) & (line >= 0) & (next_line >= 0)
+        if changing.any():
+            cost[changing] += self.transfer_matrix[
+                inter[changing], line[changing], next_line[changing]
+            ]
+        self.total_route_len[moving] += cost
+        # 执行移动
+        self.changes[moving] += (line >= 0) & (next_line != line)
+        self.pos[moving] = next_sid
+        self.line[moving] = next_line
+        self.visited[moving, next_sid] = True
+        self.routes[moving, self.route_count[moving]] = next_sid
+        self.route_count[moving] += 1
+        # 找到食物或窝：返回路线，并置位所有参数，进行相反的行为(觅食寻窝转换)
+        found = []
+        finished = moving[find_food_nest]
+        for ant_id in finished:
+            route = route_labels(self.world, self.routes[ant_id, : self.route_count[ant_id]])
+            found.append((route, _parse_number(self.total_route_len[ant_id] - 1)))
+        if len(finished) > 0:
+            self.total_food[finished[self.behavior[finished] == 1]] += 1
+            self.behavior[finished] = 1 - self.behavior[finished]
+            self.line[finished] = -1
+            self.changes[finished] = 0
+            self.total_route_len[finished] = 1
+            self.visited[finished] = self.dead_end
+            self.visited[finished, self.pos[finished]] = True
+            self.routes[finished, 0] = self.pos[finished]
+            self.route_count[finished] = 1
+        # 播撒信息素规则：寻巢的蚂蚁释放食物信息素，觅食的蚂蚁释放窝信息素，本步结束后统一累加
+        amount = 1.0 * Settings.PHEROMONE / self.total_route_len[moving]
+        nesting = self.behavior[moving] == 1
+        np.add.at(pheromone.food_pheromone, self.pos[moving][nesting], amount[nesting])
+        np.add.at(pheromone.nest_pheromone, self.pos[moving][~nesting], amount[~nesting])
+        # 剪枝规则：觅食路线耗时加剩余耗时下界已超出K短路耗时上限的蚂蚁回到蚁巢重新出发
+        limit = self.world.route_limits.get(self.food_sid)
+        if self.lower_bound is not None and limit is not None:
+            foraging = moving[~nesting & ~find_food_nest]
+            bound = self.lower_bound[self.pos[foraging], self.line[foraging] + 1]
+            self.respawn(foraging[self.total_route_len[foraging] - 1 + bound > limit])
+        return found
+
+
+def jit(function):  # 有Numba时编译为机器码(nopython模式)，否则原样返回Python函数
+    if numba is None:
+        return function
+    return numba.njit(cache=True)(function)
+
+
+@jit
+def _kernel_seed(seed):  # 设置编译代码使用的随机数种子(与Python及NumPy的随机数互不影响)
+    np.random.seed(seed)
+
+
+@jit
+def _kernel_respawn(a, nest_sid, dead_end, ants):  # 第a只蚂蚁回到蚁巢，以新的路线重新觅食
+    (pos, behavior, line, changes, total_len, is_dead, visited, routes, route_count) = ants
+    pos[a] = nest_sid
+    behavior[a] = 0
+    line[a] = -1
+    changes[a] = 0
+    total_len[a] = 1.0
+    visited[a, :] = dead_end
+    visited[a, nest_sid] = 1
+    routes[a, 0] = nest_sid
+    route_count[a] = 1
+
+
+@jit
+def _kernel_step(network, ants, pheromone, found, food_sid, nest_sid, params):
+    """
+    全部蚂蚁依次前进一步，规则与Ant相同：觅食寻巢规则(相邻站点有目标则直接过去，否则朝信息素最多的
+    方向，以MISTAKE_RATE概率选错)，移动规则(惯性前进，以PERTURBATION概率随机扰动)，避障规则，
+    播撒信息素规则及剪枝规则。找到食物或窝的路线写入found，返回条数
+    """
+    (nbr, nbr_time, nbr_line, degree, interchange, transfer_matrix, dead_end, lower_bound) = network
+    (pos, behavior, line, changes, total_len, is_dead, visited, routes, route_count) = ants
+    (food_pheromone, nest_pheromone, food_add, nest_add) = pheromone
+    (found_routes, found_count, found_len) = found
+    weight = params[0]  # PHEROMONE_WEIGHT
+    mistake_rate = params[1]  # MISTAKE_RATE
+    perturbation = params[2]  # PERTURBATION
+    amount_total = params[3]  # PHEROMONE
+    respawn = params[4] > 0  # RESPAWN
+    max_changes = params[5]  # MAX_CHANGES，负数为不限
+    limit = params[6]  # K短路耗时上限，inf为不剪枝
+    cand = np.empty(nbr.shape[1], np.int64)  # 可选的邻接边序号
+    found_num = 0
+    for a in range(pos.shape[0]):
+        if is_dead[a]:  # 如果蚂蚁状态为死亡，则不再移动
+            continue
+        cur = pos[a]
+        # 获取所有连通当前站点且未走过的站点，换乘次数已达上限时只能沿当前线路前进
+        at_limit = max_changes >= 0 and line[a] != -1 and changes[a] >= max_changes
+        n = 0
+        for j in range(degree[cur]):
+            if visited[a, nbr[cur, j]]:
+                continue
+            if at_limit and nbr_line[cur, j] != line[a]:
+                continue
+            cand[n] = j
+            n += 1
+        if n == 0:  # 没有可选线路，进入死角
+            if respawn:
+                _kernel_respawn(a, nest_sid, dead_end, ants)
+            else:
+                is_dead[a] = True
+            continue
+        # 觅食寻巢规则：相邻站点有目标则直接过去，否则朝信息素最多的方向
+        target = food_sid if behavior[a] == 0 else nest_sid
+        choice = -1
+        find_food_nest = False
+        guided = False
+        for k in range(n):
+            next_sid = nbr[cur, cand[k]]
+            if next_sid == target:
+                choice = cand[k]
+                find_food_nest = True
+                break
+            if behavior[a] == 0 and food_pheromone[next_sid] != 0:
+                guided = True
+            if behavior[a] == 1 and nest_pheromone[next_sid] != 0:
+                guided = True
+        if not find_food_nest and guided:
+            w = weight if behavior[a] == 0 else 1 - weight
+            best_value = 0.0
+            best = -1
+            for k in range(n):
+                next_sid = nbr[cur, cand[k]]
+                value = food_pheromone[next_sid] * w + nest_pheromone[next_sid] * (1 - w)
+                if value > best_value:
+                    best_value = value
+                    best = k
+            if best >= 0:
+                choice = cand[best]
+                if n >= 2 and np.random.random() <= mistake_rate:  # 选错，从其余方向随机选取
+                    k = np.random.randint(n - 1)
+                    if k >= best:
+                        k += 1
+                    choice = cand[k]
+        if choice < 0:
+            # 移动规则：沿上次所在线路前进(刚出发时随机选择)，并以PERTURBATION概率随机扰动
+            if line[a] != -1:
+                for k in range(n):
+                    if nbr_line[cur, cand[k]] == line[a]:
+                        choice = cand[k]
+                        break
+            else:
+                choice = cand[np.random.randint(n)]
+            if np.random.random() <= perturbation:
+                mistake = np.random.randint(degree[cur])  # 在所有相邻站点中随机选取一个方向
+                choice = -1
+                for k in range(n):
+                    if cand[k] == mistake:
+                        choice = mistake
+                        break
+            if choice < 0:  # 避障规则：随机选择可走方向
+                choice = cand[np.random.randint(n)]
+        # 计算当前移动后，路径耗时(含换乘耗时)
+        next_sid = nbr[cur, choice]
+        next_line = nbr_line[cur, choice]
+        total_len[a] += nbr_time[cur, choice]
+        if interchange[cur] >= 0 and line[a] != -1 and next_line != -1:
+            total_len[a] += transfer_matrix[interchange[cur], line[a], next_line]
+        routes[a, route_count[a]] = next_sid
+        route_count[a] += 1
+        if find_food_nest:  # 找到食物或窝：记录路线，并置位所有参数，进行相反的行为
+            found_routes[found_num, : route_count[a]] = routes[a, : route_count[a]]
+            found_count[found_num] = route_count[a]
+            found_len[found_num] = total_len[a] - 1
+            found_num += 1
+            for i in range(route_count[a]):
+                visited[a, routes[a, i]] = dead_end[routes[a, i]]
+            behavior[a] = 1 - behavior[a]
+            line[a] = -1
+            changes[a] = 0
+            total_len[a] = 1.0
+            routes[a, 0] = next_sid
+            route_count[a] = 1
+        else:
+            if line[a] != -1 and next_line != line[a]:  # 线路改变，换乘次数加1
+                changes[a] += 1
+            line[a] = next_line
+        pos[a] = next_sid
+        visited[a, next_sid] = 1
+        # 播撒信息素规则：寻巢的蚂蚁释放食物信息素，觅食的蚂蚁释放窝信息素，本步结束后统一累加
+        if behavior[a] == 1:
+            food_add[next_sid] += amount_total / total_len[a]
+        else:
+            nest_add[next_sid] += amount_total / total_len[a]
+        # 剪枝规则：觅食路线耗时加剩余耗时下界已超出K短路耗时上限，回到蚁巢重新出发
+        if not find_food_nest and behavior[a] == 0 and limit < np.inf:
+            if total_len[a] - 1 + lower_bound[next_sid, line[a] + 1] > limit:
+                _kernel_respawn(a, nest_sid, dead_end, ants)
+    return found_num
+
+
+class Kernel(object):  # 编译蚁群类：蚂蚁状态以数组存储，每步由编译后的_kernel_step执行全部规则
+    """
+    编译蚁群：规则与Ant(TRANSITION_RULE为"RULES")相同，蚂蚁仍按编号依次移动并读取本轮不变的信息素，
+    但整步以Numba编译为机器码执行，结果在统计上与ACO引擎一致(随机数序列不同)。
+    需要NumPy与Numba，接口与Colony相同
+    """
+
+    def __init__(self, world, nest_sid, food_sid, ants_num):
+        if np is None:
+            raise ImportError("Kernel engine requires numpy")
+        self.world = world
+        self.nest_sid = nest_sid
+        self.food_sid = food_sid
+        self.ants_num = ants_num
+        self.pruning = Settings.LOWER_BOUND_PRUNING  # 是否剪枝(否则不读取剩余耗时下界)
+        _kernel_seed(random.getrandbits(32))  # 由random派生，SEED同样有效
+        stations_num = len(world.stations)
+        (nbr, nbr_time, nbr_line) = world.get_adjacency_arrays()
+        (interchange, transfer_matrix) = world.get_transfer_matrix()
+        degree = np.array([len(edges) for edges in world.adjacency], dtype=np.int64)
+        dead_end = np.frombuffer(bytes(world.get_dead_end()), dtype=np.uint8).copy()
+        if self.pruning:  # 各站点按所在线路(列号为线路编号+1)到食物的剩余耗时下界
+            lower_bound = np.full((stations_num, len(world.lines) + 1), np.inf)
+            for (sid, bounds) in enumerate(world.get_lower_bounds(food_sid)):
+                for (line, bound) in bounds.items():
+                    lower_bound[sid, line + 1] = bound
+        else:
+            lower_bound = np.zeros((1, 1))  # 不剪枝时上限恒为inf，不会读取
+        self.network = (
+            nbr,
+            nbr_time,
+            nbr_line,
+            degree,
+            interchange,
+            transfer_matrix,
+            dead_end,
+            lower_bound,
+        )
+        self.is_dead = np.zeros(ants_num, dtype=np.bool_)  # 是否已经进入死角
+        self.ants = (
+            np.full(ants_num, nest_sid, dtype=np.int64),  # 所在站点
+            np.zeros(ants_num, dtype=np.int64),  # 0为觅食，1为寻巢
+            np.full(ants_num, -1, dtype=np.int64),  # 所在线路，-1表示刚出发
+            np.zeros(ants_num, dtype=np.int64),  # 当前路线的换乘次数
+            np.ones(ants_num),  # 总路线长度
+            self.is_dead,
+            np.tile(dead_end, (ants_num, 1)),  # 走过的站点及死胡同
+            np.zeros((ants_num, stations_num + 1), dtype=np.int64),  # 路线(站点编号)
+            np.ones(ants_num, dtype=np.int64),  # 路线站点数
+        )
+        self.ants[6][:, nest_sid] = 1
+        self.ants[7][:, 0] = nest_sid
+        self.found = (
+            np.zeros((ants_num, stations_num + 1), dtype=np.int64),  # 本步找到的路线
+            np.zeros(ants_num, dtype=np.int64),  # 路线站点数
+            np.zeros(ants_num),  # 路线耗时
+        )
+        self.labels = [station.label for station in world.stations]  # 站点名表
+        self.food_add = np.zeros(stations_num)  # 本步播撒的食物信息素，每步清零复用
+        self.nest_add = np.zeros(stations_num)  # 本步播撒的窝信息素
+        self.params = np.array(  # 规则参数，每步只更新耗时上限
+            [
+                Settings.PHEROMONE_WEIGHT,
+                Settings.MISTAKE_RATE,
+                Settings.PERTURBATION,
+                Settings.PHEROMONE,
+                1.0 if Settings.RESPAWN else 0.0,
+                -1.0 if Settings.MAX_CHANGES is None else Settings.MAX_CHANGES,
+                np.inf,  # K短路耗时上限，inf为不剪枝
+            ],
+            dtype=np.float64,
+        )
+
+    def go_next_square(self):  # 全部蚂蚁前进一步，返回本步找到食物或窝的[(路线，耗时)]
+        pheromone = self.world.pheromone
+        self.food_add.fill(0.0)
+        self.nest_add.fill(0.0)
+        if self.pruning:
+            self.params[6] = self.world.route_limits.get(self.food_sid, np.inf)
+        found_num = _kernel_step(
+            self.network,
+            self.ants,
+            (pheromone.food_pheromone, pheromone.nest_pheromone, self.food_add, self.nest_add),
+            self.found,
+            self.food_sid,
+            self.nest_sid,
+            self.params,
+        )
+        pheromone.food_pheromone += self.food_add
+        pheromone.nest_pheromone += self.nest_add
+        if found_num == 0:
+            return []
+        # 找到的路线整块转为列表后再查站点名，避免逐条切片与逐个数组元素取值
+        (found_routes, found_count, found_len) = self.found
+        routes = found_routes[:found_num].tolist()
+        counts = found_count[:found_num].tolist()
+        lengths = [int(x) if x.is_integer() else x for x in found_len[:found_num].tolist()]
+        labels = self.labels
+        return [
+            ([labels[sid] for sid in routes[i][: counts[i]]], lengths[i]) for i in range(found_num)
+        ]
+
+
+def load_world_map(path="map.txt"):  # 加载地图
     world_map = []
-    with open("map.txt") as f:
+    with open(path) as f:
         for line in f:
             world_map.append("".join(line.split("\n")).split(","))
-    # 迭代求解
-    for od in Settings.O_D.keys():
-        best_route = []  # 最短路径
-        shortest_len = 10000  # 路径损耗(耗时)
-        k_paths = []  # K短路径
-
-        world = World(world_map)
-        (x, y) = world.set_nest(od[0])
-        world.set_food(od[1])
-        ants = [Ant(world, world.SQUARES[y][x], i) for i in range(Settings.ANTS_NUM)]
-        # 迭代
-        for nc in range(Settings.MAX_NC):
-            # 每只蚂蚁
-            for ant_id in range(Settings.ANTS_NUM):
-                # 觅食或找窝(移动)
-                (route, route_len) = ants[ant_id].go_next_square()
-                # 检查返回路线有效性，无效则返回
-                if route is None or route[0] != od[0]:
-                    continue
-                # 返回路线是否大于当前最短10分钟，是则执行下轮操作
-                if route_len - shortest_len > 10:
-                    continue
-                # 记录更新最短路线
-                if route_len < shortest_len:
-                    shortest_len = route_len
-                    best_route = route
-                # 第一条K短路线，则直接插入K短路线表，并执行下轮操作
-                if len(k_paths) == 0:
-                    k_paths.insert(0, (route, route_len))
-                    continue
-                # 如果该路线已经存在于K短路线表，则忽略，继续下轮操作
-                if route in [k[0] for k in k_paths]:
-                    continue
-                else:
-                    # 检查是否超过三次换乘
-                    total_change = 0
-                    for s in ["d", "f", "j", "n", "e", "k"]:
-                        for r in route:
-                            if s == r:
-                                total_change += 1
-                    if total_change > 3:
-                        continue
-                    # 查找路线应该插入K短路线表中的位置，如果到达K短路线表末尾，则直接加到末尾
-                    tmp = len(k_paths)
-                    for i in range(tmp):
-                        if k_paths[i][1] >= route_len:
-                            k_paths.insert(i, (route, route_len))
-                            break
-                        elif i == tmp - 1:
-                            k_paths.append((route, route_len))
-            # 更新信息素
-            world.update_pheromone()
-        # ###############迭代结束##############
-        # 输出路线
-        k_path_od = []
-        if len(best_route) == 0:
-            print("search K-path for OD:" + od + " fail,please run again any way.")
+    return world_map
+
+
+def _parse_number(value):  # 解析耗时、需求量等数值，整数保持为int
+    number = float(value)
+    if number.is_integer():
+        return int(number)
+    return number
+
+
+def load_edge_list(path):
+    """
+    加载边表：CSV文件需包含表头from,to,minutes,line；JSON文件为同名字段的对象列表。
+    line可为空，此时由线路定义文件推断所属线路。返回[(起点，终点，耗时，线路)]
+    """
+    if path.endswith(".json"):
+        with open(path) as f:
+            rows = json.load(f)
+    else:
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+    edges = []
+    for row in rows:
+        edges.append(
+            (
+                str(row["from"]).strip(),
+                str(row["to"]).strip(),
+                _parse_number(row["minutes"]),
+                str(row.get("line") or "").strip(),
+            )
+        )
+    return edges
+
+
+def load_route_lines(path):
+    """
+    加载线路定义：JSON文件为{线路名:[站点,...]}；CSV文件每行为 线路名,站点,站点,...
+    站点按线路上的顺序排列，环线首尾站点视为相邻
+    """
+    if path.endswith(".json"):
+        with open(path) as f:
+            lines = json.load(f)
+        return dict((str(k), [str(v) for v in lines[k]]) for k in lines)
+    lines = {}
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            row = [v.strip() for v in row if v.strip()]
+            if row:
+                lines[row[0]] = row[1:]
+    return lines
+
+
+def load_transfers(path):  # 加载换乘耗时：JSON文件{换乘站:{"原线路->新线路":耗时}}
+    with open(path) as f:
+        transfers = json.load(f)
+    return dict(
+        (str(label), dict((str(k), _parse_number(v)) for (k, v) in transfers[label].items()))
+        for label in transfers
+    )
+
+
+def load_station_codes(path):  # 加载站点编码：JSON文件{站点名:编码}，CSV文件每行为 站点名,编码
+    if path.endswith(".json"):
+        with open(path) as f:
+            codes = json.load(f)
+        return dict((str(k), str(v)) for (k, v) in codes.items())
+    codes = {}
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            row = [v.strip() for v in row]
+            if len(row) >= 2 and row[0]:
+                codes[row[0]] = row[1]
+    return codes
+
+
+def load_network():  # 按设置加载路网，返回构造World所需的参数
+    if Settings.NETWORK_EDGES is None:
+        network = {"world_map": load_world_map(Settings.WORLD_MAP)}
+    else:
+        network = {"edges": load_edge_list(Settings.NETWORK_EDGES)}
+        if Settings.NETWORK_LINES is not None:
+            network["lines"] = load_route_lines(Settings.NETWORK_LINES)
         else:
-            for k_path in range(len(k_paths)):
-                if k_paths[k_path][1] - shortest_len > 10:
+            network["lines"] = {}
+    if Settings.NETWORK_TRANSFERS is not None:
+        network["transfers"] = load_transfers(Settings.NETWORK_TRANSFERS)
+    if Settings.NETWORK_CODES is not None:
+        network["codes"] = load_station_codes(Settings.NETWORK_CODES)
+    return network
+
+
+def search_od_k_paths(world, od, stats=None):
+    """
+    在已加载的路网world上求解单个OD对的K短路(world在各OD对之间复用)，返回K短路表[((路线，耗时)，Sx值)]。
+    stats为字典时记录求解统计：迭代次数iterations，蚂蚁移动步数ant_steps，首次找到有效路线的迭代
+    first_path_iteration(未找到为None)，结束原因stop_reason及最终信息素熵pheromone_entropy，
+    PROFILE时另有剖析统计profile(Profile.summary()，由调用方输出)
+    """
+    if Settings.SEED is not None:  # 每个OD对使用独立的随机种子，保证串行与并行结果一致
+        # 以站点名作种子，OD以站点名或外部编码给出时结果相同(与K短路缓存的键一致)
+        (origin, destination) = (world.get_station(od[0]).label, world.get_station(od[1]).label)
+        random.seed("%s:%s:%s" % (Settings.SEED, origin, destination))
+    if Settings.ENGINE == "YEN":
+        if stats is not None:
+            stats.update(
+                iterations=0,
+                ant_steps=0,
+                first_path_iteration=None,
+                stop_reason="exact",
+                pheromone_entropy=None,
+            )
+        return yen_k_paths(world, od)
+    return aco_k_paths(world, od, stats)
+
+
+def count_change(world, route):
+    """
+    统计路线(站点名表)的换乘次数，即相邻区间所属线路改变的次数(经过换乘站而不换线不计)。
+    两站点间有多条线路时取换乘次数最少的走法
+    """
+    changes = {-1: 0}  # 到达当前站点时所在线路->最少换乘次数
+    for i in range(len(route) - 1):
+        (sid, next_sid) = (world.get_sid(route[i]), world.get_sid(route[i + 1]))
+        next_changes = {}
+        for (nbr, route_time, line) in world.adjacency[sid]:
+            if nbr != next_sid:
+                continue
+            change = min(c + (1 if l != -1 and l != line else 0) for (l, c) in changes.items())
+            if line not in next_changes or change < next_changes[line]:
+                next_changes[line] = change
+        changes = next_changes
+    return min(changes.values()) if changes else 0
+
+
+def exceed_changes(world, route):  # 路线换乘次数是否超过MAX_CHANGES
+    return Settings.MAX_CHANGES is not None and count_change(world, route) > Settings.MAX_CHANGES
+
+
+# ####信息素热启动#############
+def distances_to(world, target):  # 各站点到target的最短耗时(不含换乘耗时)，不可达为None
+    reverse = [[] for i in range(len(world.stations))]  # 反向邻接表
+    for sid in range(len(world.adjacency)):
+        for (next_sid, route_time, line) in world.adjacency[sid]:
+            reverse[next_sid].append((sid, route_time))
+    dist = [None] * len(world.stations)
+    dist[target] = 0
+    heap = [(0, target)]
+    while heap:
+        (cost, cur) = heapq.heappop(heap)
+        if cost > dist[cur]:
+            continue
+        for (prev, route_time) in reverse[cur]:
+            if dist[prev] is None or cost + route_time < dist[prev]:
+                dist[prev] = cost + route_time
+                heapq.heappush(heap, (cost + route_time, prev))
+    return dist
+
+
+def lower_bounds_to(world, target):
+    """
+    线路扩展图上的反向最短路：状态为(站点，到达该站点时所在线路)，-1表示刚出发(不计换乘耗时)。
+    返回按站点编号的{所在线路:到target的最短耗时(含换乘耗时)}，不可达的状态不在表中。
+    蚂蚁的路线站点不可重复，实际剩余耗时不会小于该值，可作为剪枝的下界
+    """
+    reverse = [[] for i in range(len(world.stations))]  # 反向邻接表
+    arrive = [set([-1]) for i in range(len(world.stations))]  # 到达各站点时可能所在的线路
+    for sid in range(len(world.adjacency)):
+        for (next_sid, route_time, line) in world.adjacency[sid]:
+            reverse[next_sid].append((sid, route_time, line))
+            arrive[next_sid].add(line)
+    bounds = [{} for i in range(len(world.stations))]
+    heap = []
+    for line in arrive[target]:
+        bounds[target][line] = 0
+        heap.append((0, target, line))
+    while heap:
+        (cost, cur, cur_line) = heapq.heappop(heap)
+        if cost > bounds[cur][cur_line]:
+            continue
+        for (prev, route_time, line) in reverse[cur]:
+            if line != cur_line:  # 经该边到达cur时所在线路即为该边的线路
+                continue
+            changes = world.transfer[prev]
+            for prev_line in arrive[prev]:
+                prev_cost = cost + route_time
+                if changes is not None and prev_line != -1:  # 换乘站，查换乘耗时表
+                    prev_cost += changes.get((prev_line, line), 0)
+                if prev_line not in bounds[prev] or prev_cost < bounds[prev][prev_line]:
+                    bounds[prev][prev_line] = prev_cost
+                    heapq.heappush(heap, (prev_cost, prev, prev_line))
+    return bounds
+
+
+def snapshot_path(world, path, od):  # OD对信息素快照文件名
+    key = "%s|%s" % (world.get_station(od[0]).label, world.get_station(od[1]).label)
+    return os.path.join(path, hashlib.sha1(key.encode("utf8")).hexdigest() + ".json")
+
+
+def save_pheromone_snapshot(world, path, od):  # 保存OD对求解结束时的信息素(先写临时文件再替换)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    if np is not None:
+        food = world.pheromone.food_pheromone.tolist()
+        nest = world.pheromone.nest_pheromone.tolist()
+    else:
+        (food, nest) = (world.pheromone.food_pheromone, world.pheromone.nest_pheromone)
+    snapshot = {"network": world.network_hash(), "od": list(od[:2]), "food": food, "nest": nest}
+    filename = snapshot_path(world, path, od)
+    with open(filename + ".tmp", "w") as f:
+        json.dump(snapshot, f)
+    os.replace(filename + ".tmp", filename)
+
+
+def load_pheromone_snapshot(world, path, od):  # 加载OD对的信息素快照，返回(食物信息素，窝信息素)
+    filename = snapshot_path(world, path, od)
+    if not os.path.exists(filename):
+        return None
+    with open(filename) as f:
+        snapshot = json.load(f)
+    if snapshot["network"] != world.network_hash():  # 路网已改变，快照失效
+        return None
+    return (snapshot["food"], snapshot["nest"])
+
+
+def warm_start_pheromone(world, od):
+    """
+    按Settings.WARM_START预置信息素：HEURISTIC时各站点食物信息素为PHEROMONE/(1+到食物的最短耗时)，
+    窝信息素为PHEROMONE/(1+到窝的最短耗时)；SNAPSHOT时取上次运行的信息素快照，无有效快照则不预置。
+    返回是否预置了信息素
+    """
+    if Settings.WARM_START == "HEURISTIC":
+        pheromone = []
+        for target in (world.food_sid, world.nest_sid):
+            dist = world.get_distances(target)
+            pheromone.append(
+                [0.0 if d is None else 1.0 * Settings.PHEROMONE / (1 + d) for d in dist]
+            )
+        world.set_pheromone(pheromone[0], pheromone[1])
+        return True
+    if Settings.WARM_START == "SNAPSHOT" and Settings.PHEROMONE_SNAPSHOT is not None:
+        snapshot = load_pheromone_snapshot(world, Settings.PHEROMONE_SNAPSHOT, od)
+        if snapshot is not None:
+            world.set_pheromone(snapshot[0], snapshot[1])
+            return True
+    return False
+
+
+def pheromone_entropy(pheromone):  # 信息素分布的归一化熵，0为集中于一个站点，1为均匀分布
+    if np is not None:
+        tau = pheromone.food_pheromone + pheromone.nest_pheromone
+        total = tau.sum()
+        if total <= 0 or len(tau) < 2:
+            return 1.0
+        p = tau[tau > 0] / total
+        return float(-(p * np.log(p)).sum() / math.log(len(tau)))
+    tau = [f + n for (f, n) in zip(pheromone.food_pheromone, pheromone.nest_pheromone)]
+    total = sum(tau)
+    if total <= 0 or len(tau) < 2:
+        return 1.0
+    return -sum(v / total * math.log(v / total) for v in tau if v > 0) / math.log(len(tau))
+
+
+class Convergence(object):  # 收敛检测类
+    """
+    逐轮监测K短路线表是否稳定、最短路耗时是否停滞以及信息素熵，满足条件时提前结束迭代。
+    reason为结束原因："stable"K短路线表稳定，"stagnation"最短路停滞且信息素已收敛，
+    "max_nc"达到最大迭代次数
+    """
+
+    def __init__(self):
+        self.version = None  # 上一轮K短路线表的版本
+        self.shortest_len = None  # 上一轮的最短路耗时
+        self.stable_nc = 0  # K短路线表连续不变的迭代数
+        self.stagnation_nc = 0  # 最短路耗时连续不变的迭代数
+        self.entropy = 1.0  # 最近一轮的信息素熵
+        self.reason = "max_nc"  # 结束原因
+
+    def update(self, nc, k_paths, shortest_len, pheromone):  # 记录第nc轮的结果，返回是否提前结束
+        if k_paths.version == self.version:
+            self.stable_nc += 1
+        else:
+            self.stable_nc = 0
+            self.version = k_paths.version
+        if shortest_len == self.shortest_len:
+            self.stagnation_nc += 1
+        else:
+            self.stagnation_nc = 0
+            self.shortest_len = shortest_len
+        self.entropy = pheromone_entropy(pheromone)
+        if len(k_paths) == 0 or nc + 1 < Settings.MIN_NC:  # 尚未找到路线时不提前结束
+            return False
+        if Settings.STABLE_NC > 0 and self.stable_nc >= Settings.STABLE_NC:
+            self.reason = "stable"
+            return True
+        if (
+            Settings.STAGNATION_NC > 0
+            and self.stagnation_nc >= Settings.STAGNATION_NC
+            and self.entropy <= Settings.PHEROMONE_ENTROPY
+        ):
+            self.reason = "stagnation"
+            return True
+        return False
+
+
+class Profile(object):  # 剖析统计类
+    """
+    单个OD对求解过程的统计(PROFILE开启时)：蚂蚁各规则的调用次数与耗时，进入死角、被剪枝的次数，
+    往返次数(搬回的食物数)，以及找到的路线被接受的条数和按原因分类的未被接受条数：
+    window超出K短路时间窗，duplicate已在K短路表中，changes超过MAX_CHANGES次换乘，full表已满(MAX_K_PATHS)
+    """
+
+    def __init__(self):
+        self.calls = collections.Counter()  # 规则名->调用次数
+        self.times = collections.Counter()  # 规则名->累计耗时(秒)
+        self.dead = 0  # 进入死角的次数，None为未统计(批量/编译蚁群)
+        self.pruned = 0  # 被剪枝召回的次数，None为未统计
+        self.round_trips = None  # 往返次数，None为未统计(编译蚁群)
+        self.accepted = 0  # 加入K短路表的路线数
+        self.rejected = collections.Counter()  # 原因->未被接受的路线数
+        self.iterations = 0  # 迭代次数
+        self.stop_reason = None  # 结束原因
+
+    def call(self, name, rule, ant, *args):  # 调用规则并计时
+        start = time.perf_counter()
+        result = rule(ant, *args)
+        self.times[name] += time.perf_counter() - start
+        self.calls[name] += 1
+        return result
+
+    def summary(self):  # 统计结果字典
+        return {
+            "iterations": self.iterations,
+            "stop_reason": self.stop_reason,
+            "rules": dict((name, (self.calls[name], self.times[name])) for name in self.calls),
+            "dead": self.dead,
+            "pruned": self.pruned,
+            "round_trips": self.round_trips,
+            "accepted": self.accepted,
+            "rejected": dict(self.rejected),
+        }
+
+
+class KPaths(object):  # K短路线表类
+    """
+    K短路线表：路线按耗时有序存放，耗时相同时后加入的排在前面(与原逐个比较插入的顺序一致)，
+    二分查找插入位置，以路线元组集合去重。最短路更新时淘汰超出K_PATH_WINDOW的路线，
+    MAX_K_PATHS大于0时只保留耗时最小的MAX_K_PATHS条
+    """
+
+    def __init__(self):
+        self.entries = []  # 有序的(耗时，-加入序号，路线元组，路线)
+        self.routes = set()  # 表中路线元组集合
+        self.added = 0  # 累计加入的路线数
+        self.version = 0  # 路线表每次变化加1
+        self.best_route = []  # 最短路径
+        self.shortest_len = 10000  # 路径损耗(耗时)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, route):
+        return tuple(route) in self.routes
+
+    def push(self, route, route_len):  # 加入路线，返回是否加入
+        key = tuple(route)
+        if key in self.routes:
+            return False
+        entry = (route_len, -self.added, key, route)
+        full = Settings.MAX_K_PATHS > 0 and len(self.entries) >= Settings.MAX_K_PATHS
+        if full and entry[:2] > self.entries[-1][:2]:
+            return False
+        bisect.insort(self.entries, entry)
+        self.routes.add(key)
+        self.added += 1
+        self.version += 1
+        if full:
+            self.pop()
+        return True
+
+    def pop(self):  # 移除耗时最大的路线
+        entry = self.entries.pop()
+        self.routes.discard(entry[2])
+        self.version += 1
+
+    def evict(self, shortest_len):  # 淘汰耗时超出最短路K_PATH_WINDOW的路线
+        while self.entries and self.entries[-1][0] - shortest_len > Settings.K_PATH_WINDOW:
+            self.pop()
+
+    def items(self):  # 按耗时从小到大返回[(路线，耗时)]
+        return [(entry[3], entry[0]) for entry in self.entries]
+
+    def offer(self, world, route, route_len):  # 处理蚂蚁找到的一条路线，返回是否在时间窗内(有效)
+        # 返回路线是否大于当前最短K_PATH_WINDOW分钟，是则执行下轮操作
+        if route_len - self.shortest_len > Settings.K_PATH_WINDOW:
+            return False
+        # 如果该路线已经存在于K短路线表，则忽略，继续下轮操作
+        if route in self:
+            return True
+        # 检查是否超过MAX_CHANGES次换乘(第一条路线同样检查，超限的路线不作为最短路)
+        if exceed_changes(world, route):
+            return True
+        # 记录更新最短路线，并淘汰K短路线表中超出时间窗的路线
+        if route_len < self.shortest_len:
+            self.shortest_len = route_len
+            self.best_route = route
+            self.evict(route_len)
+        self.push(route, route_len)
+        return True
+
+    def k_path_od(self):  # 最终K短路表[((路线，耗时)，Sx值)]，去除超出最短路时间窗的路线
+        k_path_od = []
+        if len(self.best_route) != 0:
+            for k_path in self.items():
+                if k_path[1] - self.shortest_len > Settings.K_PATH_WINDOW:
                     break
-                else:
-                    print(
-                        "The "
-                        + str(k_path + 1)
-                        + " K-path for OD: "
-                        + od
-                        + "->"
-                        + "-".join(k_paths[k_path][0])
-                        + " time:"
-                        + str(k_paths[k_path][1])
-                        + " min"
-                    )
-                    k_path_od.append((k_paths[k_path], Sx(k_paths[k_path][1], shortest_len)))
-
-        # 断面流量处理
-        # 只有一条路
-        if len(k_path_od) == 1:
-            # print("只有一条路")
-            for i in range(len(k_path_od[0][0][0]) - 1):
-                Settings.ALL_TWO[k_path_od[0][0][0][i] + k_path_od[0][0][0][i + 1]] += Settings.O_D[
-                    od
-                ]
+                k_path_od.append((k_path, Sx(k_path[1], self.shortest_len)))
+        return k_path_od
+
+
+class ProfiledKPaths(KPaths):  # 剖析K短路线表类：按原因统计找到的路线未被接受的条数
+    def __init__(self, profile):
+        KPaths.__init__(self)
+        self.profile = profile
+
+    def offer(self, world, route, route_len):
+        if route_len - self.shortest_len > Settings.K_PATH_WINDOW:
+            reason = "window"
+        elif route in self:
+            reason = "duplicate"
+        elif exceed_changes(world, route):
+            reason = "changes"
+        else:
+            reason = None
+        added = self.added
+        valid = KPaths.offer(self, world, route, route_len)
+        if reason is None and self.added == added:
+            reason = "full"
+        if reason is None:
+            self.profile.accepted += 1
         else:
-            for k_path in range(len(k_path_od)):
-                k_two = [k_path_od[i][0][1] for i in range(len(k_path_od))]
-                k_two.insert(0, k_path_od[k_path][0][1])
-                for i in range(len(k_path_od[k_path][0][0]) - 1):
-                    Settings.ALL_TWO[
-                        k_path_od[k_path][0][0][i] + k_path_od[k_path][0][0][i + 1]
-                    ] += Settings.O_D[od] * Pk(k_two)
+            self.profile.rejected[reason] += 1
+        return valid
+
+
+def aco_k_paths(world, od, stats=None):  # 蚁群算法求解K短路
+    first_path_iteration = None  # 首次找到有效路线的迭代
+    ant_steps = 0  # 存活蚂蚁的移动步数
+    profile = Profile() if Settings.PROFILE else None  # 剖析统计
+    k_paths = KPaths() if profile is None else ProfiledKPaths(profile)  # K短路径
+    convergence = Convergence()  # 收敛检测
+    iterations = Settings.MAX_NC  # 实际迭代次数
+
+    world.reset(od[0], od[1])
+    warm_start_pheromone(world, od)
+    nest = world.stations[world.nest_sid]
+    engine = Settings.ENGINE
+    if engine == "KERNEL" and (numba is None or Settings.TRANSITION_RULE != "RULES"):
+        engine = "ACO"  # 编译蚁群只实现了"RULES"规则，未安装Numba时同样以纯Python求解
+    if engine == "COLONY":  # 批量蚁群，全部蚂蚁整体前进
+        colony = Colony(world, nest.sid, world.food_sid, Settings.ANTS_NUM)
+    elif engine == "KERNEL":  # 编译蚁群，整步以机器码执行
+        colony = Kernel(world, nest.sid, world.food_sid, Settings.ANTS_NUM)
+    elif profile is not None:  # 剖析各规则
+        ants = [ProfiledAnt(world, nest, i, profile=profile) for i in range(Settings.ANTS_NUM)]
+    else:
+        ants = [Ant(world, nest, i) for i in range(Settings.ANTS_NUM)]
+    # 迭代
+    for nc in range(Settings.MAX_NC):
+        # 每只蚂蚁觅食或找窝(移动)
+        if engine != "ACO":
+            if stats is not None:
+                ant_steps += int((~colony.is_dead).sum())
+            results = colony.go_next_square()
+        else:
+            if stats is not None:
+                ant_steps += sum(1 for ant in ants if not ant.is_dead)
+            results = [ants[ant_id].go_next_square() for ant_id in range(Settings.ANTS_NUM)]
+        for (route, route_len) in results:
+            # 检查返回路线有效性，无效则返回
+            if route is None or route[0] != nest.label:
+                continue
+            if k_paths.offer(world, route, route_len) and first_path_iteration is None:
+                first_path_iteration = nc
+        if k_paths.best_route:  # 已有最短路，此后超出时间窗的蚂蚁可被剪枝
+            world.route_limits[world.food_sid] = k_paths.shortest_len + Settings.K_PATH_WINDOW
+        # 更新信息素
+        world.update_pheromone()
+        # 收敛则提前结束
+        if convergence.update(nc, k_paths, k_paths.shortest_len, world.pheromone):
+            iterations = nc + 1
+            break
+    # ###############迭代结束##############
+    if stats is not None:
+        stats["iterations"] = iterations
+        stats["stop_reason"] = convergence.reason
+        stats["pheromone_entropy"] = convergence.entropy
+        stats["ant_steps"] = ant_steps
+        stats["first_path_iteration"] = first_path_iteration
+    if profile is not None:
+        profile.iterations = iterations
+        profile.stop_reason = convergence.reason
+        if engine == "ACO":
+            profile.round_trips = sum(ant.total_food for ant in ants)
+        else:  # 批量/编译蚁群不逐只统计进入死角、被剪枝的次数
+            profile.dead = None
+            profile.pruned = None
+            if engine == "COLONY":
+                profile.round_trips = int(colony.total_food.sum())
+        if stats is not None:  # 由调用方输出(并行求解时在主进程按OD顺序输出)
+            stats["profile"] = profile.summary()
+    if Settings.PHEROMONE_SNAPSHOT is not None:
+        save_pheromone_snapshot(world, Settings.PHEROMONE_SNAPSHOT, od)
+    return k_paths.k_path_od()
+
+
+def search_group_k_paths(world, origin, destinations):
+    """
+    合并求解同一起点origin到多个终点destinations的K短路，返回与destinations顺序一致的K短路表列表。
+    Yen算法逐个OD对求解；批量蚁群(COLONY)不支持多层信息素，以蚂蚁逐个移动的方式求解
+    """
+    if Settings.SEED is not None:  # 每组使用独立的随机种子(以站点名作种子，与编码无关)
+        labels = [world.get_station(key).label for key in [origin] + list(destinations)]
+        random.seed("%s:%s:%s" % (Settings.SEED, labels[0], "|".join(labels[1:])))
+    if Settings.ENGINE == "YEN":
+        return [yen_k_paths(world, (origin, destination)) for destination in destinations]
+    return aco_group_k_paths(world, origin, destinations)
+
+
+def aco_group_k_paths(world, origin, destinations, stats=None):
+    """
+    同一起点的多个OD对合并为一个蚁群求解：每个终点有自己的食物信息素层，窝信息素各终点共用。
+    蚂蚁按编号轮流分配终点(每个终点GROUP_ANTS只，默认ANTS_NUM只)，觅食途中经过其它终点时，已走过的路线同样计为该
+    OD对的路线，起点附近共同部分的搜索只需一次。全部终点均收敛或达到MAX_NC时结束。
+    蚂蚁途经的其它终点同样有用，因此不按自己终点的时间窗剪枝(不设置route_limits)
+    """
+    first_path_iteration = None  # 首次找到有效路线的迭代
+    ant_steps = 0  # 存活蚂蚁的移动步数
+    iterations = Settings.MAX_NC  # 实际迭代次数
+    world.reset(origin, *destinations)
+    nest = world.stations[world.nest_sid]
+    targets = dict((world.food_sids[i], i) for i in range(len(destinations)))  # 终点->序号
+    k_paths = [KPaths() for destination in destinations]  # 各OD对的K短路径
+    convergences = [Convergence() for destination in destinations]  # 各OD对的收敛检测
+    ants = []
+    group_ants = Settings.ANTS_NUM if Settings.GROUP_ANTS is None else Settings.GROUP_ANTS
+    for ant_id in range(group_ants * len(destinations)):
+        i = ant_id % len(destinations)
+        layer = i if world.layers else None
+        ants.append(Ant(world, nest, ant_id, world.food_sids[i], layer))
+    # 迭代
+    for nc in range(Settings.MAX_NC):
+        if stats is not None:
+            ant_steps += sum(1 for ant in ants if not ant.is_dead)
+        for ant in ants:
+            (route, route_len) = ant.go_next_square()
+            if route is not None:  # 找到自己的终点(或回到起点，此时路线无效)
+                if route[0] != nest.label:
+                    continue
+                i = targets[ant.target]
+            elif ant.behavior == "FOOD" and ant.square.sid in targets and not ant.is_dead:
+                # 觅食途中经过其它终点，已走过的路线即为到该终点的路线
+                i = targets[ant.square.sid]
+                route = route_labels(world, ant.route)
+                route_len = ant.total_route_len - 1
+            else:
+                continue
+            if k_paths[i].offer(world, route, route_len) and first_path_iteration is None:
+                first_path_iteration = nc
+        # 更新信息素
+        world.update_pheromone()
+        # 全部终点均收敛则提前结束
+        converged = True
+        for i in range(len(destinations)):
+            if world.layers:
+                pheromone = Pheromone(world.layers[i], world.pheromone.nest_pheromone)
+            else:
+                pheromone = world.pheromone
+            if not convergences[i].update(nc, k_paths[i], k_paths[i].shortest_len, pheromone):
+                converged = False
+        if converged:
+            iterations = nc + 1
+            break
+    # ###############迭代结束##############
+    if stats is not None:
+        stats["iterations"] = iterations
+        stats["stop_reason"] = "converged" if iterations < Settings.MAX_NC else "max_nc"
+        stats["ant_steps"] = ant_steps
+        stats["first_path_iteration"] = first_path_iteration
+    return [k_path.k_path_od() for k_path in k_paths]
+
+
+# ####Yen算法(精确K短路)#############
+def route_cost(world, route):  # 计算路线(站点编号表)耗时，包括换乘耗时
+    cost = 0
+    for i in range(len(route) - 1):
+        cost += world.get_route_time(route[i], route[i + 1])
+        if i > 0:
+            cost += world.change_route_cost(route[i - 1], route[i], route[i + 1])
+    return cost
+
+
+def dijkstra_route(world, source, line, target, banned_stations, banned_routes, change_count=0):
+    """
+    线路扩展图上的最短路：状态为(站点，所在线路，已换乘次数)，线路改变时在换乘站加上换乘耗时，
+    换乘次数超过MAX_CHANGES的状态不再扩展。line为到达source时所在线路(-1表示起点)，change_count为
+    到达source时已换乘次数，banned_stations为不可经过的站点，banned_routes为不可从source出发
+    经过的相邻站点。返回(路线，耗时)，无路可走时返回(None, None)
+    """
+    start = (source, line, change_count)
+    dist = {start: 0}
+    parent = {start: None}
+    heap = [(0, source, line, change_count)]
+    while heap:
+        (cost, cur, cur_line, cur_changes) = heapq.heappop(heap)
+        if cost > dist[(cur, cur_line, cur_changes)]:
+            continue
+        if cur == target:
+            route = []
+            state = (cur, cur_line, cur_changes)
+            while state is not None:
+                route.append(state[0])
+                state = parent[state]
+            route.reverse()
+            return (route, cost)
+        changes = world.transfer[cur]
+        for (next_sid, route_time, next_line) in world.adjacency[cur]:
+            if next_sid in banned_stations:
+                continue
+            if cur == source and next_sid in banned_routes:
+                continue
+            next_changes = cur_changes
+            if Settings.MAX_CHANGES is not None and cur_line != -1 and next_line != cur_line:
+                next_changes += 1
+                if next_changes > Settings.MAX_CHANGES:
+                    continue
+            next_cost = cost + route_time
+            if changes is not None and cur_line != -1:
+                next_cost += changes.get((cur_line, next_line), 0)
+            state = (next_sid, next_line, next_changes)
+            if state not in dist or next_cost < dist[state]:
+                dist[state] = next_cost
+                parent[state] = (cur, cur_line, cur_changes)
+                heapq.heappush(heap, (next_cost, next_sid, next_line, next_changes))
+    return (None, None)
+
+
+def yen_k_paths(world, od):
+    """
+    Yen算法求解K短路：依次以上一条K短路的各站点为偏离点求偏离路径，候选路线存于堆中，
+    按耗时从小到大取出，直到超过最短路10分钟。结果与蚁群算法相同，为[((路线，耗时)，Sx)]，
+    同样排除超过MAX_CHANGES次换乘的路线(最短路亦按换乘次数限制求解)，路线中站点不可重复。
+    偏离路径自偏离点按根路径已换乘次数继续计数，不扩展超限的状态
+    """
+    source = world.get_sid(od[0])
+    target = world.get_sid(od[1])
+    (route, cost) = dijkstra_route(world, source, -1, target, set(), set())
+    if route is None:
+        return []
+    shortest_len = cost
+    a_routes = [route]  # 已确定的K短路(站点编号表)
+    b_routes = []  # 候选路线堆
+    seen = set([tuple(route)])
+    k_path_od = [((route_labels(world, route), cost), Sx(cost, shortest_len))]
+    while True:
+        prev_route = a_routes[-1]
+        for i in range(len(prev_route) - 1):
+            spur = prev_route[i]
+            root = prev_route[: i + 1]
+            banned_routes = set()
+            for r in a_routes:
+                if r[: i + 1] == root:
+                    banned_routes.add(r[i + 1])
+            line = world.get_edge(root[-2], spur)[2] if i > 0 else -1
+            change_count = count_change(world, route_labels(world, root)) if i > 1 else 0
+            (spur_route, spur_cost) = dijkstra_route(
+                world, spur, line, target, set(root[:-1]), banned_routes, change_count
+            )
+            if spur_route is None:
+                continue
+            route = root[:-1] + spur_route
+            if tuple(route) in seen or len(set(route)) != len(route):  # 排除重复以及回头的路线
+                continue
+            seen.add(tuple(route))
+            heapq.heappush(b_routes, (route_cost(world, route), route))
+        if len(b_routes) == 0:
+            break
+        (cost, route) = heapq.heappop(b_routes)
+        if cost - shortest_len > Settings.K_PATH_WINDOW:
+            break
+        a_routes.append(route)
+        labels = route_labels(world, route)
+        if exceed_changes(world, labels):  # 检查是否超过MAX_CHANGES次换乘
+            continue
+        k_path_od.append(((labels, cost), Sx(cost, shortest_len)))
+    return k_path_od
+
+
+def route_labels(world, route):  # 站点编号表转为站点名表
+    return [world.stations[sid].label for sid in route]
+
+
+def od_name(od):  # OD对的显示名称：Settings.O_D中的OD原样输出，(起点，终点)以逗号分隔
+    if isinstance(od, str):
+        return od
+    return "%s,%s" % (od[0], od[1])
+
+
+def print_k_paths(od, k_path_od):  # 输出路线
+    if len(k_path_od) == 0:
+        print("search K-path for OD:" + od_name(od) + " fail,please run again any way.")
+        return
+    for k_path in range(len(k_path_od)):
+        print(
+            "The "
+            + str(k_path + 1)
+            + " K-path for OD: "
+            + od_name(od)
+            + "->"
+            + "-".join(k_path_od[k_path][0][0])
+            + " time:"
+            + str(k_path_od[k_path][0][1])
+            + " min"
+        )
+
+
+def print_profile(od, profile):  # 输出OD对的剖析统计(Profile.summary()字典)，未统计的项输出n/a
+    def count(value):
+        return "n/a" if value is None else str(value)
+
+    print(
+        "Profile for OD: "
+        + od_name(od)
+        + " iterations:"
+        + str(profile["iterations"])
+        + " stop:"
+        + str(profile["stop_reason"])
+        + " dead:"
+        + count(profile["dead"])
+        + " pruned:"
+        + count(profile["pruned"])
+        + " round trips:"
+        + count(profile["round_trips"])
+        + " accepted:"
+        + str(profile["accepted"])
+        + " rejected:"
+        + ",".join("%s=%d" % item for item in sorted(profile["rejected"].items()))
+    )
+    for name in sorted(profile["rules"]):
+        (calls, times) = profile["rules"][name]
+        print("  %s calls:%d time:%.4f s" % (name, calls, times))
+
+
+def assign_section_flow(world, flows, batch):
+    """
+    断面流量处理：batch为一批OD对的[(K短路表，需求量)]，累加到断面流量数组flows(按边编号)并返回。
+    只有一条路时全部分配到该路线，否则按Pk分配(路线耗时/各路线耗时之和)。各路线的分配比例一次算出，
+    再经稀疏的路线-边关联(边编号，路线编号)一次累加，计算量随K线性增长
+    """
+    edge_ids = []  # 路线-边关联：边编号
+    path_ids = []  # 路线-边关联：路线编号
+    route_lens = []  # 各路线耗时
+    totals = []  # 各路线所属OD对的路线耗时之和(只有一条路时为该路线耗时)
+    demands = []  # 各路线所属OD对的需求量
+    for (k_path_od, demand) in batch:
+        total = sum(k_path[0][1] for k_path in k_path_od)
+        for k_path in k_path_od:
+            route = [world.get_sid(label) for label in k_path[0][0]]
+            for i in range(len(route) - 1):
+                edge_ids.append(world.edge_index[(route[i], route[i + 1])])
+                path_ids.append(len(route_lens))
+            route_lens.append(k_path[0][1])
+            totals.append(total)
+            demands.append(demand)
+    if len(edge_ids) == 0:
+        return flows
+    if np is not None:
+        volumes = np.asarray(demands) * (np.asarray(route_lens, dtype=float) / np.asarray(totals))
+        np.add.at(flows, edge_ids, volumes[path_ids])
+        return flows
+    volumes = [d * (1.0 * l / t) for (d, l, t) in zip(demands, route_lens, totals)]
+    return add_at(flows, [(eid, volumes[pid]) for (eid, pid) in zip(edge_ids, path_ids)])
+
+
+def section_flows(world, flows):  # 断面流量数组转换为{相邻两站点名:流量}，格式同Settings.ALL_TWO
+    if np is not None:
+        flows = np.asarray(flows).tolist()
+    two_flows = {}
+    for eid in range(len(world.edges)):
+        if flows[eid] != 0:
+            (sid, next_sid) = world.edges[eid]
+            two_flows[world.stations[sid].label + world.stations[next_sid].label] = flows[eid]
+    return two_flows
+
+
+def read_od_chunks(path=None, chunk_size=None, skip=0):
+    """
+    按块读取OD需求，每块为[(OD，需求量)]。path为CSV文件(表头o,d,demand)，OD为(起点，终点)；
+    path为空时取Settings.O_D。skip为跳过的行数(从检查点继续)，不把整个OD矩阵读入内存
+    """
+    if chunk_size is None:
+        chunk_size = Settings.OD_CHUNK
+    if path is None:
+        rows = iter(Settings.O_D.items())
+        f = None
+    else:
+        f = open(path, newline="")
+        rows = (
+            ((str(row["o"]).strip(), str(row["d"]).strip()), _parse_number(row["demand"]))
+            for row in csv.DictReader(f)
+        )
+    try:
+        chunk = []
+        for (n, row) in enumerate(rows):
+            if n < skip:
+                continue
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        if f is not None:
+            f.close()
+
+
+def od_source(path=None):
+    """
+    OD需求的来源标识，记入检查点：OD文件为[路径，大小，修改时间]，未设置OD文件时为Settings.O_D的哈希值。
+    来源改变后已求解的行数不再有效
+    """
+    if path is None:
+        od = json.dumps(Settings.O_D, sort_keys=True)
+        return hashlib.sha1(od.encode("utf8")).hexdigest()
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime]
+
+
+def save_flow_checkpoint(world, path, rows, flows, source=None):
+    """
+    保存已求解的OD行数及断面流量(先写临时文件再替换)，同时记录OD来源source及路网指纹
+    """
+    if np is not None:
+        flows = np.asarray(flows).tolist()
+    checkpoint = {
+        "od_source": source,
+        "network": world.network_hash(),
+        "rows": rows,
+        "edges": [
+            [world.stations[sid].label, world.stations[next_sid].label]
+            for (sid, next_sid) in world.edges
+        ],
+        "flows": flows,
+    }
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".tmp", path)
+
+
+def load_flow_checkpoint(world, path, source=None):
+    """
+    加载检查点，返回(已求解的OD行数，断面流量数组)。OD来源或路网与检查点记录的不一致时
+    (OD文件或路网已改变)，检查点无效，返回None，从头开始求解
+    """
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("od_source") != source or checkpoint.get("network") != world.network_hash():
+        return None
+    deposits = []
+    for ((label, next_label), flow) in zip(checkpoint["edges"], checkpoint["flows"]):
+        edge = (world.get_sid(label), world.get_sid(next_label))
+        deposits.append((world.edge_index[edge], flow))
+    return (checkpoint["rows"], add_at(new_array(len(world.edges)), deposits))
+
+
+# ####K短路缓存#############
+# 不影响求解结果的参数，不计入缓存键(路网数据以World.network_hash计入)
+_CACHE_IGNORED_SETTINGS = (
+    "O_D",
+    "ALL_TWO",
+    "WORKERS",
+    "WORLD_MAP",
+    "NETWORK_EDGES",
+    "NETWORK_LINES",
+    "NETWORK_TRANSFERS",
+    "NETWORK_CODES",
+    "OD_FILE",
+    "OD_CHUNK",
+    "FLOW_CHECKPOINT",
+    "PATH_CACHE",
+    "PATH_CACHE_SIZE",
+    "PROFILE",
+    "PHEROMONE_SNAPSHOT",
+)
+_path_cache_memory = {}  # 缓存版本->内存缓存(模块级，同一进程内多次求解共用，只保留当前版本)
+
+
+class PathCache(object):  # K短路缓存类
+    """
+    K短路缓存：以(起点，终点)为键，内存中按LRU保留最近的PATH_CACHE_SIZE个OD对，设置path时同时存于磁盘，
+    重复求解同一路网时直接返回。缓存版本为路网指纹与求解参数的哈希，版本不同时清空磁盘缓存。
+    内存缓存按版本保存在模块中，同一进程内多次调用Init_ACO_K_ShortRoute时共用
+    """
+
+    def __init__(self, world, path=None, size=None):
+        self.world = world
+        self.size = Settings.PATH_CACHE_SIZE if size is None else size
+        params = dict(
+            (k, v) for (k, v) in _settings_snapshot().items() if k not in _CACHE_IGNORED_SETTINGS
+        )
+        self.version = hashlib.sha1(
+            json.dumps([world.network_hash(), params], sort_keys=True, default=repr).encode("utf8")
+        ).hexdigest()
+        if self.version not in _path_cache_memory:  # 路网或参数已改变，内存缓存失效
+            _path_cache_memory.clear()
+            _path_cache_memory[self.version] = collections.OrderedDict()
+        self.memory = _path_cache_memory[self.version]  # 内存缓存，按最近使用排序
+        self.store = None  # 磁盘缓存
+        if path is not None:
+            self.store = shelve.open(path)
+            if self.store.get("__version__") != self.version:  # 路网或参数已改变，缓存失效
+                self.store.clear()
+                self.store["__version__"] = self.version
+
+    def key(self, od):  # 缓存键：起点、终点的站点名(OD可为站点名或外部编码)
+        return "%s|%s" % (self.world.get_station(od[0]).label, self.world.get_station(od[1]).label)
+
+    def get(self, od):  # 查找OD对的K短路表，未缓存时返回None
+        key = self.key(od)
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        if self.store is not None and key in self.store:
+            k_path_od = self.store[key]
+            self.remember(key, k_path_od)
+            return k_path_od
+        return None
+
+    def put(self, od, k_path_od):
+        """
+        缓存OD对的K短路表。蚁群算法未找到路线(空表)时不缓存，下次仍重新求解；
+        只有精确的YEN引擎的空表(确实无路可走)才缓存
+        """
+        if len(k_path_od) == 0 and Settings.ENGINE != "YEN":
+            return
+        key = self.key(od)
+        self.remember(key, k_path_od)
+        if self.store is not None:
+            self.store[key] = k_path_od
+
+    def remember(self, key, k_path_od):  # 存入内存缓存，超出容量时淘汰最久未使用的
+        if self.size <= 0:
+            return
+        self.memory[key] = k_path_od
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.size:
+            self.memory.popitem(last=False)
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+
+# ####并行求解(进程池)#############
+_worker_world = None  # 工作进程持有的路网，各OD对复用
+
+
+def _settings_snapshot():  # 获取当前参数设置，传递给工作进程(spawn方式启动时子进程不会继承修改过的参数)
+    return dict((k, v) for (k, v) in vars(Settings).items() if k.isupper())
+
+
+def _init_worker(network, settings):  # 工作进程初始化
+    global _worker_world
+    for k, v in settings.items():
+        setattr(Settings, k, v)
+    _worker_world = World(**network)
+
+
+def _search_od_task(od):  # 工作进程执行单个OD对的求解
+    return solve_od(_worker_world, od)
+
+
+def _search_group_task(group):  # 工作进程执行同一起点的一组OD对的求解
+    return search_group_k_paths(_worker_world, group[0], group[1])
+
+
+def group_ignored_settings():  # GROUP_OD时设置了但不起作用的参数名
+    ignored = []
+    if Settings.ENGINE in ("COLONY", "KERNEL"):
+        ignored.append("ENGINE=" + Settings.ENGINE)
+    for name in ("PROFILE", "WARM_START", "PHEROMONE_SNAPSHOT"):
+        if getattr(Settings, name):
+            ignored.append(name)
+    return ignored
+
+
+def solve_od(world, od):
+    """
+    求解单个OD对，返回(K短路表，统计)。PROFILE时统计为search_od_k_paths的统计字典(含剖析统计)，
+    随结果返回主进程输出，否则为None
+    """
+    stats = {} if Settings.PROFILE else None
+    return (search_od_k_paths(world, od, stats), stats)
+
+
+def solve_ods(world, ods, pool=None, workers=1):
+    """
+    求解一批OD对，按ods顺序返回各OD对的(K短路表，统计)，统计见solve_od。GROUP_OD时同一起点的OD对
+    合并为一组求解(不统计，为None)，pool不为空时交由进程池求解(按OD顺序返回，与进程调度无关)
+    """
+    if not Settings.GROUP_OD:
+        if pool is not None:
+            chunksize = max(1, len(ods) // (workers * 4))
+            return pool.imap(_search_od_task, ods, chunksize)  # imap按OD顺序返回结果
+        return (solve_od(world, od) for od in ods)
+    groups = collections.OrderedDict()  # 起点->[终点]
+    for od in ods:
+        destinations = groups.setdefault(world.get_station(od[0]).label, [])
+        if world.get_station(od[1]).label not in destinations:
+            destinations.append(world.get_station(od[1]).label)
+    groups = list(groups.items())
+    if pool is not None:
+        chunksize = max(1, len(groups) // (workers * 4))
+        results = pool.imap(_search_group_task, groups, chunksize)
+    else:
+        results = (search_group_k_paths(world, origin, dests) for (origin, dests) in groups)
+    solved = {}  # (起点，终点)->K短路表
+    for ((origin, destinations), k_path_ods) in zip(groups, results):
+        for (destination, k_path_od) in zip(destinations, k_path_ods):
+            solved[(origin, destination)] = k_path_od
+    return [
+        (solved[(world.get_station(od[0]).label, world.get_station(od[1]).label)], None)
+        for od in ods
+    ]
+
+
+def Init_ACO_K_ShortRoute(workers=None):  # 算法函数
+    """
+    求解全部OD对并累加断面流量到Settings.ALL_TWO，返回断面流量数组(按边编号)。
+    OD需求按块读取(Settings.OD_FILE或Settings.O_D)，设置FLOW_CHECKPOINT时每块求解后保存检查点
+    """
+    # 加载路网
+    network = load_network()
+    if workers is None:
+        workers = Settings.WORKERS
+    world = World(**network)  # 路网只加载一次，各OD对求解前重置
+    flows = new_array(len(world.edges))
+    rows = 0  # 已求解的OD行数
+    checkpoint = Settings.FLOW_CHECKPOINT
+    source = od_source(Settings.OD_FILE) if checkpoint is not None else None  # OD来源标识
+    if checkpoint is not None and os.path.exists(checkpoint):
+        loaded = load_flow_checkpoint(world, checkpoint, source)
+        if loaded is None:
+            print("checkpoint " + checkpoint + " does not match OD demand or network,start over.")
+        else:
+            (rows, flows) = loaded
+    cache = PathCache(world, Settings.PATH_CACHE)  # 已求解过的OD对直接取缓存
+    if Settings.GROUP_OD and group_ignored_settings():
+        warnings.warn("GROUP_OD ignores " + ", ".join(group_ignored_settings()))
+    # 迭代求解，各OD对之间相互独立，可交由进程池并行求解
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(
+            workers, initializer=_init_worker, initargs=(network, _settings_snapshot())
+        )
+    try:
+        for chunk in read_od_chunks(Settings.OD_FILE, skip=rows):
+            # 站点不在路网中的OD行跳过(与求解失败的OD对同样输出)，不中断流式求解
+            known = [world.has_station(o) and world.has_station(d) for ((o, d), demand) in chunk]
+            results = [cache.get(chunk[i][0]) if known[i] else [] for i in range(len(chunk))]
+            ods = [chunk[i][0] for i in range(len(chunk)) if results[i] is None]  # 需求解的OD对
+            solved = solve_ods(world, ods, pool, workers)
+            missing = [i for i in range(len(chunk)) if results[i] is None]
+            profiles = [None] * len(chunk)  # 剖析统计，随结果从工作进程返回，在此输出
+            for (i, (k_path_od, stats)) in zip(missing, solved):
+                results[i] = k_path_od
+                if stats is not None:
+                    profiles[i] = stats.get("profile")
+                cache.put(chunk[i][0], k_path_od)
+            # 按OD顺序输出路线并累加断面流量，保证结果与进程调度无关
+            batch = []
+            for (i, ((od, demand), k_path_od)) in enumerate(zip(chunk, results)):
+                if not known[i]:
+                    print("search K-path for OD:" + od_name(od) + " fail,unknown station.")
+                    continue
+                print_k_paths(od, k_path_od)
+                if profiles[i] is not None:
+                    print_profile(od, profiles[i])
+                batch.append((k_path_od, demand))
+            flows = assign_section_flow(world, flows, batch)  # 整块OD对一次分配
+            rows += len(chunk)
+            if checkpoint is not None:
+                save_flow_checkpoint(world, checkpoint, rows, flows, source)
+    finally:
+        cache.close()
+        if pool is not None:
+            pool.close()
+            pool.join()
+    for (two, flow) in section_flows(world, flows).items():
+        Settings.ALL_TWO[two] = Settings.ALL_TWO.get(two, 0) + flow
+    return flows
 
 
 # 配送相关处理，求断面流量
@@ -1344,10 +3180,6 @@ def Sx(Ck, Cmin):
     return math.exp(-2 * (pow((Ck - Cmin), 2) / 25.0))
 
 
-def Pk(Sk):
-    return 1.0 * Sk[0] / (sum(Sk[1:]))
-
-
 # 启动算法
 if __name__ == "__main__":
     print("please waiting...")
@@ -0,0 +1,213 @@
+# -*-coding:utf8-*-
+#
+# 求解器性能测试
+#
+# 在自带路网(map.txt)以及规模递增的合成路网上，以固定随机种子运行各求解引擎，统计：
+# 每个OD对的求解耗时，蚂蚁移动步数/秒，首次找到有效路线的迭代，内存峰值，以及与精确K短路(Yen算法)
+# 相比的求解质量(最短路是否找到，K短路召回率)。结果以JSON输出，便于对比发现性能退化。
+# 内存测试：统计每个站点(World)以及每只蚂蚁(Ant，含其站点记忆)占用的字节数
+#
+# 用法：python benchmark.py --engines ACO,COLONY,KERNEL --sizes 4,6,8 --ods 20 --output benchmark_results.json
+#
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from ant_k_path import (
+    Ant,
+    Settings,
+    World,
+    load_network,
+    search_od_k_paths,
+    yen_k_paths,
+)
+
+
+def measure_bytes(build):  # 统计build()分配并仍然持有的内存字节数
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    obj = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return (obj, size)
+
+
+def memory_benchmark(network, ants_num=Settings.ANTS_NUM):  # 返回每个站点及每只蚂蚁的字节数
+    world, world_bytes = measure_bytes(lambda: World(**network))
+    nest = world.stations[0]
+    ants, ants_bytes = measure_bytes(lambda: [Ant(world, nest, i) for i in range(ants_num)])
+    return {
+        "stations": len(world.stations),
+        "ants": ants_num,
+        "bytes_per_station": 1.0 * world_bytes / len(world.stations),
+        "bytes_per_ant": 1.0 * ants_bytes / ants_num,
+    }
+
+
+def synthetic_network(size, seed=0):
+    """
+    合成路网：size条横线与size条竖线交织成网格，每个交点为横线与竖线的换乘站，
+    站间耗时2~8分钟，换乘耗时5~10分钟，共size*size个站点
+    """
+    rng = random.Random(seed)
+
+    def label(i, j):  # 第i条横线与第j条竖线交点的站点名
+        return "S%d_%d" % (i, j)
+
+    edges = []
+    lines = {}
+    for i in range(size):
+        lines["H%d" % i] = [label(i, j) for j in range(size)]
+        lines["V%d" % i] = [label(j, i) for j in range(size)]
+        for j in range(size - 1):
+            edges.append((label(i, j), label(i, j + 1), rng.randint(2, 8), "H%d" % i))
+            edges.append((label(j, i), label(j + 1, i), rng.randint(2, 8), "V%d" % i))
+    transfers = {}
+    for i in range(size):
+        for j in range(size):
+            h, v = ("H%d" % i, "V%d" % j)
+            transfers[label(i, j)] = {
+                h + "->" + v: rng.randint(5, 10),
+                v + "->" + h: rng.randint(5, 10),
+            }
+    return {"edges": edges, "lines": lines, "transfers": transfers}
+
+
+def sample_ods(network, ods_num, seed=0):  # 固定种子随机抽取OD对
+    world = World(**network)
+    labels = [square.label for square in world.stations]
+    rng = random.Random(seed)
+    ods = []
+    while len(ods) < ods_num:
+        o, d = rng.sample(labels, 2)
+        ods.append((o, d))
+    return ods
+
+
+def solution_quality(k_path_od, exact):  # 与精确K短路对比：最短路是否找到，K短路召回率
+    found = set(tuple(k[0][0]) for k in k_path_od)
+    expected = set(tuple(k[0][0]) for k in exact)
+    shortest_found = len(k_path_od) > 0 and k_path_od[0][0][1] <= exact[0][0][1]
+    recall = 1.0 * len(found & expected) / len(expected) if expected else 1.0
+    return (shortest_found, recall)
+
+
+def run_case(name, network, ods, engine):  # 在一个路网上以一种引擎求解所有OD对
+    old_engine = Settings.ENGINE
+    Settings.ENGINE = engine
+    try:
+        world = World(**network)
+        if engine == "KERNEL":  # 先求解一次，编译(或加载已编译的)代码不计入耗时
+            search_od_k_paths(world, ods[0])
+        total_time = 0.0
+        total_steps = 0
+        first_iterations = []
+        iterations = 0
+        shortest_found = 0
+        recalls = []
+        failed = 0
+        for od in ods:
+            stats = {}
+            start = time.perf_counter()
+            k_path_od = search_od_k_paths(world, od, stats)
+            total_time += time.perf_counter() - start
+            total_steps += stats["ant_steps"]
+            iterations += stats["iterations"]
+            if stats["first_path_iteration"] is not None:
+                first_iterations.append(stats["first_path_iteration"])
+            if len(k_path_od) == 0:
+                failed += 1
+            exact = yen_k_paths(world, od)
+            if exact:
+                found, recall = solution_quality(k_path_od, exact)
+                shortest_found += found
+                recalls.append(recall)
+        # 内存峰值：再次求解第一个OD对，以tracemalloc统计
+        tracemalloc.start()
+        search_od_k_paths(world, ods[0])
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        Settings.ENGINE = old_engine
+    return {
+        "network": name,
+        "engine": engine,
+        "stations": len(world.stations),
+        "ods": len(ods),
+        "seed": Settings.SEED,
+        "ants": Settings.ANTS_NUM,
+        "max_nc": Settings.MAX_NC,
+        "wall_time_per_od": total_time / len(ods),
+        "iterations_per_od": 1.0 * iterations / len(ods),
+        "ant_steps_per_second": total_steps / total_time if total_steps > 0 else None,
+        "mean_first_path_iteration": (
+            1.0 * sum(first_iterations) / len(first_iterations) if first_iterations else None
+        ),
+        "failed_ods": failed,
+        "peak_memory_bytes": peak,
+        "shortest_found_rate": 1.0 * shortest_found / len(recalls) if recalls else None,
+        "k_path_recall": sum(recalls) / len(recalls) if recalls else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ACO K-shortest-path solver benchmark")
+    parser.add_argument(
+        "--engines", default="ACO,COLONY,KERNEL,YEN", help="comma separated engines"
+    )
+    parser.add_argument(
+        "--sizes", default="4,6,8", help="synthetic grid sizes (size*size stations)"
+    )
+    parser.add_argument("--ods", type=int, default=20, help="OD pairs sampled per network")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    parser.add_argument("--memory-ants", type=int, default=1000, help="ants in memory benchmark")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON result file")
+    args = parser.parse_args(argv)
+
+    Settings.SEED = args.seed
+    networks = [("map", load_network())]
+    for size in [int(v) for v in args.sizes.split(",") if v]:
+        networks.append(("grid%dx%d" % (size, size), synthetic_network(size, args.seed)))
+    results = {"memory": [], "cases": []}
+    for name, network in networks:
+        memory = memory_benchmark(network, args.memory_ants)
+        memory["network"] = name
+        results["memory"].append(memory)
+        ods = sample_ods(network, args.ods, args.seed)
+        for engine in args.engines.split(","):
+            if engine == "COLONY":
+                try:
+                    import numpy  # noqa: F401
+                except ImportError:
+                    continue
+            if engine == "KERNEL":
+                try:
+                    import numba  # noqa: F401
+                except ImportError:
+                    continue
+            case = run_case(name, network, ods, engine)
+            results["cases"].append(case)
+            print(
+                "%-10s %-7s stations:%4d  time/od:%8.4fs  failed:%3d  recall:%s"
+                % (
+                    name,
+                    engine,
+                    case["stations"],
+                    case["wall_time_per_od"],
+                    case["failed_ods"],
+                    "%.3f" % case["k_path_recall"] if case["k_path_recall"] is not None else "-",
+                )
+            )
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print("results written to " + args.output)
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])